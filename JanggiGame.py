@@ -5,62 +5,198 @@
 #               individual piece classes, which are separate and contain rules
 #               for each piece.
 
+from move_tables import (SQUARE_NAMES, SQUARE_INDEX, HORSE_MOVES, HORSE_LEGS,
+                         ELEPHANT_MOVES, ELEPHANT_LEGS, LINE_RAYS,
+                         LINES_BETWEEN, PALACE_MOVES, SOLDIER_MOVES,
+                         HORSE_ATTACKS, ELEPHANT_ATTACKS, SOLDIER_ATTACKS,
+                         square_index, square_name)
+from zobrist import PIECE_KEYS, SIDE_KEY, compute_hash
+from move_cache import MoveCache
+from evaluation import DEFAULT_EVALUATION
+import notation
+import weakref
+
 class JanggiGame:
     """
     Represent a JanggiGame object. Take no parameters and initialize private
-    data members for _game_state, _board, _player_turn, and _in_check.
+    data members for _game_state, _board, _player_turn, _in_check,
+    _undo_stack, _hash, _piece_squares, _generals, _codes, _evaluation,
+    _square_values, _score, _searcher and _parallel.
     """
 
     def __init__(self):
         """
         Initialize JanggiGame object with _game_state, _board, _player_turn,
-        and _in_check private data members.
+        _in_check, _undo_stack, _hash, _piece_squares, _generals, _codes,
+        _evaluation, _square_values, _score, _searcher and _parallel private
+        data members.
         """
 
-        self._game_state = 'UNFINISHED' #UNFINISHED, RED_WON, BLUE_WON
-        self._board = {}
-        self._player_turn = 'BLUE'
-        self._in_check = None #"RED", "BLUE"
-
-        #initialize blank board
-        cols = 'abcdefghi'
-        for row in range(10):
-            for col in range(len(cols)):
-                self._board[cols[col]+str(row+1)] = 0
+        self._clear()
 
         #Red initial board placement
-        self._board['a1'] = Chariot("RED",'a1')
-        self._board['b1'] = Elephant("RED",'b1')
-        self._board['c1'] = Horse("RED",'c1')
-        self._board['d1'] = Guard("RED",'d1')
-        self._board['f1'] = Guard("RED",'f1')
-        self._board['g1'] = Elephant("RED",'g1')
-        self._board['h1'] = Horse("RED",'h1')
-        self._board['i1'] = Chariot("RED",'i1')
-        self._board['e2'] = General('RED','e2')
-        self._board['b3'] = Cannon('RED','b3')
-        self._board['h3'] = Cannon('RED','h3')
+        self._place(Chariot, "RED", 'a1')
+        self._place(Elephant, "RED", 'b1')
+        self._place(Horse, "RED", 'c1')
+        self._place(Guard, "RED", 'd1')
+        self._place(Guard, "RED", 'f1')
+        self._place(Elephant, "RED", 'g1')
+        self._place(Horse, "RED", 'h1')
+        self._place(Chariot, "RED", 'i1')
+        self._place(General, 'RED', 'e2')
+        self._place(Cannon, 'RED', 'b3')
+        self._place(Cannon, 'RED', 'h3')
         for pos in ['a4','c4','e4','g4','i4']:
-            self._board[pos] = Soldier('RED',pos)
+            self._place(Soldier, 'RED', pos)
 
         #Blue initial board placement
-        self._board['a10'] = Chariot("BLUE",'a10')
-        self._board['b10'] = Elephant("BLUE",'b10')
-        self._board['c10'] = Horse("BLUE",'c10')
-        self._board['d10'] = Guard("BLUE",'d10')
-        self._board['f10'] = Guard("BLUE",'f10')
-        self._board['g10'] = Elephant("BLUE",'g10')
-        self._board['h10'] = Horse("BLUE",'h10')
-        self._board['i10'] = Chariot("BLUE",'i10')
-        self._board['e9'] = General('BLUE','e9')
-        self._board['b8'] = Cannon('BLUE','b8')
-        self._board['h8'] = Cannon('BLUE','h8')
+        self._place(Chariot, "BLUE", 'a10')
+        self._place(Elephant, "BLUE", 'b10')
+        self._place(Horse, "BLUE", 'c10')
+        self._place(Guard, "BLUE", 'd10')
+        self._place(Guard, "BLUE", 'f10')
+        self._place(Elephant, "BLUE", 'g10')
+        self._place(Horse, "BLUE", 'h10')
+        self._place(Chariot, "BLUE", 'i10')
+        self._place(General, 'BLUE', 'e9')
+        self._place(Cannon, 'BLUE', 'b8')
+        self._place(Cannon, 'BLUE', 'h8')
         for pos in ['a7','c7','e7','g7','i7']:
-            self._board[pos] = Soldier('BLUE',pos)
+            self._place(Soldier, 'BLUE', pos)
+
+        self._hash = compute_hash(self._board, self._player_turn) #Zobrist key
+
+    def _clear(self):
+        """
+        Set every private data member to an empty board with BLUE to move.
+        """
+        self._game_state = 'UNFINISHED' #UNFINISHED, RED_WON, BLUE_WON
+        self._board = [0] * 90 #initialize blank board
+        self._player_turn = 'BLUE'
+        self._in_check = None #"RED", "BLUE"
+        self._undo_stack = [] #(origin, destination, captured, turn, in_check, game_state, hash)
+        self._hash = 0 #Zobrist key, set once the pieces are placed
+        self._piece_squares = {'RED': set(), 'BLUE': set()} #occupied squares per side
+        self._generals = {'RED': None, 'BLUE': None} #general square per side
+        self._codes = bytearray(90) #piece code per square, 0 if empty
+        self._evaluation = DEFAULT_EVALUATION
+        self._square_values = DEFAULT_EVALUATION.square_values() #per piece code and square
+        self._score = 0 #material and piece-square score, positive when RED is ahead
+        self._searcher = None #Searcher while a search() runs, for stop_search()
+        self._parallel = None #ParallelSearcher while a search() with workers > 1 runs
+
+    def _place(self, piece_class, side, name):
+        """
+        Take piece class, side and square in algebraic notation and put the
+        shared piece on the board. Used for the initial setup.
+        """
+        index = SQUARE_INDEX[name]
+        self._put_piece(piece_class.for_side(side), index)
+
+    def _put_piece(self, piece, index):
+        """
+        Take piece and board index, put the piece on the empty square and
+        record it in the piece squares, general and code indexes.
+        """
+        side = piece.get_side()
+        self._board[index] = piece
+        self._codes[index] = piece.get_code()
+        self._score += self._square_values[piece.get_code()][index]
+        self._piece_squares[side].add(index)
+        if type(piece) == General:
+            self._generals[side] = index
+
+    def _load(self, codes, player_turn, in_check, game_state):
+        """
+        Take 90 piece codes, side to move, side in check (or None) and game
+        state, either of the last two possibly notation.UNKNOWN, and set the
+        game up from them, with the shared pieces for their codes. The check
+        and game state are recomputed from the board. Raise ValueError unless
+        each side has one general, if the side that just moved has left its
+        general capturable, or if a given check or game state disagrees with
+        the board.
+        """
+        self._clear()
+        for index in range(90):
+            if codes[index]:
+                self._put_piece(piece_from_code(codes[index]), index)
+        for side in ('RED', 'BLUE'):
+            generals = [index for index in self._piece_squares[side]
+                        if type(self._board[index]) == General]
+            if len(generals) != 1:
+                raise ValueError("%s must have exactly one general" % side)
+        self._player_turn = player_turn
+        if self.is_general_attacked(self._opposing_side(player_turn)):
+            raise ValueError("%s to move can capture the opposing general" % player_turn)
+        self._hash = compute_hash(self._board, self._player_turn)
+        self._update_check_state()
+        if in_check != notation.UNKNOWN and in_check != self._in_check:
+            raise ValueError("position gives %s in check, the board has %s" % (
+                in_check or 'no side', self._in_check or 'no side'))
+        if game_state != notation.UNKNOWN and game_state != self._game_state:
+            raise ValueError("position gives game state %s, the board has %s" % (
+                game_state, self._game_state))
+
+    @classmethod
+    def from_fen(cls, text):
+        """
+        Take FEN string (see notation.py), return a JanggiGame set up in that
+        position. Raise ValueError if the string is malformed or its check or
+        winner field disagrees with the board.
+        """
+        game = cls.__new__(cls)
+        game._load(*notation.from_fen(text))
+        return game
+
+    def to_fen(self):
+        """
+        Return the current position as a FEN string (see notation.py).
+        """
+        return notation.to_fen(self._codes, self._player_turn, self._in_check,
+                               self._game_state)
+
+    @classmethod
+    def from_packed(cls, data):
+        """
+        Take packed position bytes from to_packed(), return a JanggiGame set
+        up in that position. Raise ValueError if the data is corrupt or its
+        check or winner flag disagrees with the board.
+        """
+        game = cls.__new__(cls)
+        game._load(*notation.unpack(data))
+        return game
+
+    def to_packed(self):
+        """
+        Return the current position as notation.PACKED_SIZE (46) bytes: the
+        90 squares at 4 bits each plus a turn/check/winner flag byte.
+        """
+        return notation.pack(self._codes, self._player_turn, self._in_check,
+                             self._game_state)
+
+    @classmethod
+    def from_codes(cls, codes, player_turn):
+        """
+        Take 90 piece codes (see get_piece_codes()) and side to move, return
+        a JanggiGame set up in that position, with check and game state
+        worked out from the board. Raise ValueError unless each side has one
+        general, or if the side not to move is in check.
+        """
+        game = cls.__new__(cls)
+        game._load(codes, player_turn, notation.UNKNOWN, notation.UNKNOWN)
+        return game
+
+    def probe_tablebase(self, tablebase):
+        """
+        Take tablebase.Tablebase, return its TablebaseResult (WIN, LOSS or
+        DRAW for the side to move, with distance to mate in plies) for the
+        current position, or None if no table covers its material.
+        """
+        return tablebase.probe(self._codes, self._player_turn)
 
     def get_board(self):
         """
-        Return the current board. For testing.
+        Return the current board as a list of 90 squares. For testing.
         """
 
         return self._board
@@ -85,11 +221,51 @@ class JanggiGame:
         else:
             return False
 
+    def get_player_turn(self):
+        """
+        Return the side to move, 'BLUE' or 'RED'.
+        """
+        return self._player_turn
+
+    def evaluate(self):
+        """
+        Return the material and piece-square score of the current position
+        from the point of view of the side to move. Kept up to date by
+        push_move()/pop_move(), so this is O(1). If the evaluation is
+        validating, the score is also recounted from scratch and
+        AssertionError is raised if the two differ.
+        """
+        if self._evaluation.is_validating():
+            expected = self._evaluation.score_codes(self._codes)
+            if expected != self._score:
+                raise AssertionError("incremental score %d != recounted score %d" % (
+                    self._score, expected))
+        if self._player_turn == 'RED':
+            return self._score
+        return -self._score
+
+    def set_evaluation(self, evaluation):
+        """
+        Take evaluation.Evaluation and score the game with it from now on.
+        pop_move() reverses each move's score change with the tables in use
+        at the time, so moves made before the switch undo correctly.
+        """
+        self._evaluation = evaluation
+        self._square_values = evaluation.square_values()
+        self._score = evaluation.score_codes(self._codes)
+
+    def position_hash(self):
+        """
+        Return the 64-bit Zobrist key of the current position (pieces and side
+        to move). Kept up to date incrementally by push_move()/pop_move().
+        """
+        return self._hash
+
     def get_piece(self, origin):
         """
-        Take origin, return piece object from board.
+        Take origin in algebraic notation, return piece object from board.
         """
-        return self._board[origin]
+        return self._board[SQUARE_INDEX[origin]]
 
     def make_move(self, origin, destination):
         """
@@ -99,8 +275,15 @@ class JanggiGame:
         move, False if not.
         """
 
+        #0) Is the game still being played and are both squares on the board?
+        if self._game_state != 'UNFINISHED':
+            return False
+        if origin not in SQUARE_INDEX or destination not in SQUARE_INDEX:
+            return False
+        origin = SQUARE_INDEX[origin]
+        destination = SQUARE_INDEX[destination]
+
         #1) Check if there is a piece at the location
-        #print("Attempted move from ",origin,"to ",destination)
         if self._board[origin] == 0:
             return False
 
@@ -108,141 +291,602 @@ class JanggiGame:
         if self._player_turn != self._board[origin].get_side():
             return False
 
-        #3) If there is a piece there and it is player's turn update position
-        #...and update status of check
-        self._board[origin].set_position(origin)
-        self.check_check(origin, destination)
-
-        #4) Is the move to the same location, i.e., a pass-move
+        #3) Is the move to the same location, i.e., a pass-move. A player in
+        #...check may not pass, since that leaves the general capturable
         if origin == destination:
-            if self._player_turn == "BLUE":
-                self._player_turn = "RED"
-                return True
-            elif self._player_turn == "RED":
-                self._player_turn = "BLUE"
-                return True
-
-        #5) Do the rules specific to the piece prohibit the move
-        if self._board[origin].check_piece_rules(destination, self._board) == False:
-            return False
+            if self.is_general_attacked(self._player_turn):
+                return False
+            self.push_move(origin, destination)
+            return True
 
-        #6) Considering board state, is destination available (occupy/capture) to piece?
-        if destination not in self._board[origin].check_available_moves(self._board).keys():
+        #4) Considering board state, is destination available (occupy/capture)
+        #...to piece? The generated moves already follow the piece's rules and
+        #...its palace diagonals, and are cached per position
+        if destination not in self._available_moves(origin):
             return False
 
-        #7) Is the piece attempting to move diagonally outside palace and not horse or elephant?
-        if self._board[origin].check_diagonal(destination) == False:
-            return False
+        #5) Record the move (this also switches turns) so it can be checked
+        #...against the resulting board
+        self.push_move(origin, destination)
 
-        #8) Does the move put moving party in check (first eval)
+        #6) Does the move leave the moving party in check? Take it back if so
         if self.check_check(origin, destination) == False:
+            self.pop_move()
             return False
 
-        #9) Hypothetically record the move to ensure it doesn't cause check,
-        #...take it back if it does and return false. Otherwise, record move
-        else:
-            saved_board = dict(self._board) #Save the board state
-            self._board[destination] = self._board[origin] #Temporarily record the move
-            self._board[origin] = 0
-
-            if self.check_check(origin, destination) == False: #Does second eval of move trigger check?
-                self._board = saved_board   #Restore the prior board state
-                return False #Prohibit the move
-            else: #Otherwise, record the move
-                self._board = saved_board #Restore the saved board
-                self._board[destination] = self._board[origin] #record the move
-                self._board[origin] = 0
-                self._board[destination].set_position(destination) #Update piece record
-
-        #10) If the other party is now in check/mate, record that as well.
-                opposing_general = [key for key, value in self._board.items() if type(value) == General and value.get_side() != self._board[destination].get_side()]
-                opposing_general[0]
-                if opposing_general[0] in self._board[destination].check_available_moves(self._board).keys():
-                        self._in_check = self._board[opposing_general[0]].get_side() #Update status of in_check
-
-        #11) Switch turns
-                if self._player_turn == "BLUE":
-                    self._player_turn = "RED"
-                elif self._player_turn == "RED":
-                    self._player_turn = "BLUE"
-                return True
+        #7) If the other party is now in check/mate, record that as well.
+        self._update_check_state()
+        return True
+
+    def _update_check_state(self):
+        """
+        After a move, set _in_check if the side to move is in check and
+        _game_state if it is also checkmated, i.e. has no legal move. A side
+        that is not in check can always pass, so there is no stalemate.
+        """
+        self._in_check = None
+        moving_side = self._opposing_side(self._player_turn)
+        if self.is_square_attacked(self._generals[self._player_turn], moving_side):
+            self._in_check = self._player_turn #Update status of in_check
+            if not self.has_any_legal_move(self._player_turn):
+                self._game_state = moving_side + '_WON'
+
+    def _piece_moves(self, origin):
+        """
+        Take board index of a piece, return its generate_moves() list. The
+        piece calls made by make_move() go through this small method so
+        instrumentation can wrap it for one game.
+        """
+        return self._board[origin].generate_moves(origin, self._board)
+
+    def _available_moves(self, origin):
+        """
+        Take board index of a piece, return tuple of the board indices it can
+        move to or capture on, from the shared move cache if this position
+        was seen before.
+        """
+        key = (self._hash, origin)
+        moves = _MOVE_CACHE.get(key)
+        if moves is None:
+            moves = tuple(self._piece_moves(origin))
+            _MOVE_CACHE.put(key, moves)
+        return moves
+
+    def get_available_moves(self, origin):
+        """
+        Take square in algebraic notation, return list of the squares the
+        piece there can move to or capture on (pseudo-legal: moves that leave
+        its general in check are included), or an empty list if the square
+        is empty.
+        """
+        origin = SQUARE_INDEX[origin]
+        if self._board[origin] == 0:
+            return []
+        return [SQUARE_NAMES[destination] for destination in self._available_moves(origin)]
+
+    def _legal_moves(self):
+        """
+        Return tuple of every legal (origin, destination) board index pair
+        for the side to move, passes excluded, from the shared legal move
+        cache if this position was seen before.
+        """
+        key = (self._hash, self._player_turn)
+        moves = _LEGAL_MOVE_CACHE.get(key)
+        if moves is None:
+            side = self._player_turn
+            legal = []
+            for origin, destination in self.generate_moves(side):
+                self.push_move(origin, destination)
+                if not self.is_general_attacked(side):
+                    legal.append((origin, destination))
+                self.pop_move()
+            moves = tuple(sorted(legal))
+            _LEGAL_MOVE_CACHE.put(key, moves)
+        return moves
+
+    def legal_moves(self, square):
+        """
+        Take square in algebraic notation, return list of the squares the
+        piece there can legally move to now (empty if the square is empty,
+        holds a piece of the side not to move, or the game is over). Passes
+        are not listed.
+        """
+        origin = SQUARE_INDEX[square]
+        if self._game_state != 'UNFINISHED':
+            return []
+        return [SQUARE_NAMES[destination] for move_origin, destination in self._legal_moves()
+                if move_origin == origin]
+
+    def all_legal_moves(self):
+        """
+        Return list of every legal move for the side to move as (origin,
+        destination) pairs in algebraic notation, passes excluded. Empty if
+        the game is over.
+        """
+        if self._game_state != 'UNFINISHED':
+            return []
+        return [(SQUARE_NAMES[origin], SQUARE_NAMES[destination])
+                for origin, destination in self._legal_moves()]
+
+    @staticmethod
+    def get_move_cache_stats():
+        """
+        Return dict with the statistics (see MoveCache.get_stats()) of the
+        process-wide 'available' (pseudo-legal, per piece) and 'legal' (per
+        position and side) move caches.
+        """
+        return {'available': _MOVE_CACHE.get_stats(), 'legal': _LEGAL_MOVE_CACHE.get_stats()}
+
+    def get_move_history(self):
+        """
+        Return list of the moves recorded since the game was set up, oldest
+        first, as (origin, destination) pairs in algebraic notation. Passes
+        appear with origin == destination.
+        """
+        return [(SQUARE_NAMES[entry[0]], SQUARE_NAMES[entry[1]]) for entry in self._undo_stack]
+
+    def push_move(self, origin, destination):
+        """
+        Take origin and destination board indices and record the move without
+        validating it, then switch turns. origin == destination records a
+        pass. The moved piece, any captured piece and the prior turn, check
+        and game state are kept on the undo stack so pop_move() can take the
+        move back. Used by make_move() and for search.
+        """
+        board = self._board
+        captured = board[destination]
+        self._undo_stack.append((origin, destination, captured, self._player_turn,
+                                 self._in_check, self._game_state, self._hash))
+        key = self._hash ^ SIDE_KEY
+        if origin != destination:
+            piece = board[origin]
+            side = piece.get_side()
+            piece_keys = PIECE_KEYS[piece.get_kind(), side]
+            key ^= piece_keys[origin] ^ piece_keys[destination]
+            squares = self._piece_squares[side]
+            squares.discard(origin)
+            squares.add(destination)
+            if type(piece) == General:
+                self._generals[side] = destination
+            if captured != 0:
+                captured_side = captured.get_side()
+                key ^= PIECE_KEYS[captured.get_kind(), captured_side][destination]
+                self._piece_squares[captured_side].discard(destination)
+                if type(captured) == General:
+                    self._generals[captured_side] = None
+            board[destination] = piece
+            board[origin] = 0
+            codes = self._codes
+            values = self._square_values[codes[origin]]
+            self._score += values[destination] - values[origin]
+            if codes[destination]:
+                self._score -= self._square_values[codes[destination]][destination]
+            codes[destination] = codes[origin]
+            codes[origin] = 0
+        self._hash = key
+        self._switch_turn()
+
+    def pop_move(self):
+        """
+        Take back the last move recorded by push_move() or make_move().
+        Return the (origin, destination) of the move taken back, or None if
+        there is no move to take back.
+        """
+        if not self._undo_stack:
+            return None
+        origin, destination, captured, turn, in_check, game_state, key = self._undo_stack.pop()
+        if origin != destination:
+            piece = self._board[destination]
+            self._board[origin] = piece
+            self._board[destination] = captured
+            codes = self._codes
+            codes[origin] = codes[destination]
+            codes[destination] = 0 if captured == 0 else captured.get_code()
+            #Undo the score change with the current tables (see set_evaluation())
+            values = self._square_values[codes[origin]]
+            self._score += values[origin] - values[destination]
+            if codes[destination]:
+                self._score += self._square_values[codes[destination]][destination]
+            side = piece.get_side()
+            squares = self._piece_squares[side]
+            squares.discard(destination)
+            squares.add(origin)
+            if type(piece) == General:
+                self._generals[side] = origin
+            if captured != 0:
+                captured_side = captured.get_side()
+                self._piece_squares[captured_side].add(destination)
+                if type(captured) == General:
+                    self._generals[captured_side] = destination
+        self._player_turn = turn
+        self._in_check = in_check
+        self._game_state = game_state
+        self._hash = key
+        return (origin, destination)
+
+    def generate_moves(self, side):
+        """
+        Take side, return list of every pseudo-legal move for that side as
+        (origin, destination) board index pairs, in one pass over the side's
+        pieces. Moves that would leave the side's own general in check are
+        included; make_move() rejects those.
+        """
+        moves = []
+        board = self._board
+        for origin in self._piece_squares[side]:
+            for destination in board[origin].generate_moves(origin, board):
+                moves.append((origin, destination))
+        return moves
+
+    def generate_captures(self, side):
+        """
+        Take side, return list of that side's pseudo-legal captures as
+        (origin, destination) board index pairs, most valuable victim first
+        and, for the same victim, least valuable attacker first (MVV-LVA).
+        """
+        board = self._board
+        captures = []
+        for origin in self._piece_squares[side]:
+            attacker = EXCHANGE_VALUES[board[origin].get_kind()]
+            for destination in board[origin].generate_moves(origin, board):
+                victim = board[destination]
+                if victim != 0:
+                    captures.append((-EXCHANGE_VALUES[victim.get_kind()], attacker,
+                                     origin, destination))
+        captures.sort()
+        return [(origin, destination) for _, _, origin, destination in captures]
+
+    def static_exchange(self, square):
+        """
+        Take square in algebraic notation, return the material the side to
+        move wins (negative: loses) by capturing the piece there and letting
+        both sides recapture with their least valuable piece, either side
+        stopping when further captures would lose. 0 if the square holds no
+        opposing piece, the side to move cannot legally capture it, or the
+        game is over. Piece values are EXCHANGE_VALUES.
+        """
+        if self._game_state != 'UNFINISHED':
+            return 0
+        return self._static_exchange(SQUARE_INDEX[square])
+
+    def _static_exchange(self, square):
+        """
+        Take board index, return static_exchange() for it. The captures are
+        played with push_move() and taken back, so cannon screens and horse
+        and elephant legs opened by pieces leaving are seen by the next
+        attacker.
+        """
+        target = self._board[square]
+        if target == 0 or target.get_side() == self._player_turn:
+            return 0
+        gains = [] #value of the piece taken by each capture in the sequence
+        value = EXCHANGE_VALUES[target.get_kind()]
+        pushed = 0
+        try:
+            while True:
+                side = self._player_turn
+                for origin in self._attackers(square, side):
+                    self.push_move(origin, square)
+                    if not self.is_general_attacked(side):
+                        break
+                    self.pop_move() #capture would leave the general capturable
+                else:
+                    break
+                pushed += 1
+                gains.append(value)
+                if value == EXCHANGE_VALUES[0]:
+                    break #a general was taken: nothing left to play for
+                value = EXCHANGE_VALUES[self._board[square].get_kind()]
+        finally:
+            for _ in range(pushed):
+                self.pop_move()
+        if not gains:
+            return 0
+        score = 0
+        for gain in reversed(gains[1:]): #each recapture is optional
+            score = max(0, gain - score)
+        return gains[0] - score
+
+    def _attackers(self, square, by_side):
+        """
+        Take board index and attacking side, return list of the board indices
+        of by_side's pieces that could capture on that square, least valuable
+        first (see _attacker_squares()).
+        """
+        board = self._board
+        return sorted(self._attacker_squares(square, by_side),
+                      key=lambda origin: (EXCHANGE_VALUES[board[origin].get_kind()], origin))
+
+    def search(self, depth=None, time_limit=None, info=None, workers=1):
+        """
+        Take maximum depth and/or time limit in seconds, an optional info
+        callback called after each completed iteration and the number of
+        processes to search with. Search the current position with
+        iterative-deepening alpha-beta and return a dict with best 'move'
+        and principal variation 'pv' in algebraic notation, 'score',
+        'depth', 'nodes', 'time' and 'nps'. With one worker the search uses
+        a transposition table shared by every game in the process that uses
+        the same evaluation, kept between searches; with more, helper
+        processes share a fresh table in shared memory (see lazy_smp.py).
+        stop_search() cancels a running search. No engine state stays on the
+        game afterwards, so it can still be copied and pickled. The engine
+        modules are imported on the first call.
+        """
+        from search import Searcher #the engine loads on first search only
+        report = None
+        if info is not None:
+            report = lambda result: info(_named_result(result))
+        try:
+            if workers > 1:
+                from lazy_smp import ParallelSearcher
+                self._parallel = ParallelSearcher(self, workers)
+                return _named_result(self._parallel.search(depth, time_limit, report))
+            self._searcher = Searcher(self, _search_table(self._evaluation))
+            return _named_result(self._searcher.search(depth, time_limit, report))
+        finally:
+            self._searcher = None
+            self._parallel = None
+
+    def stop_search(self):
+        """
+        Cancel a search running in another thread. It returns the result of
+        its last completed iteration.
+        """
+        if self._searcher is not None:
+            self._searcher.stop()
+        if self._parallel is not None:
+            self._parallel.stop()
+
+    def get_general_square(self, side):
+        """
+        Take side, return board index of that side's general, or None if it
+        is not on the board. Kept up to date on every move and capture.
+        """
+        return self._generals[side]
+
+    def get_piece_codes(self):
+        """
+        Return bytes of 90 piece codes, one per board index: 0 for an empty
+        square, otherwise Piece.get_code(). Kept up to date on every move.
+        """
+        return bytes(self._codes)
+
+    def get_piece_squares(self, side):
+        """
+        Take side, return sorted list of the board indices occupied by that
+        side's pieces. Kept up to date on every move and capture.
+        """
+        return sorted(self._piece_squares[side])
+
+    def is_general_attacked(self, side):
+        """
+        Take side, return True if that side's general can be captured in the
+        current position, False otherwise.
+        """
+        general = self._generals[side]
+        return general is not None and self.is_square_attacked(general, self._opposing_side(side))
 
     def check_check(self, origin, destination):
         """
         Helper function to evaluate status of check for make_move(). Take
-        origin and desination, return False if move prohibited due to check
-        also evaluates checkmate and ends game if it occurs.
-        """
-        # Find the generals
-        general_positions = [key for key, value in self._board.items() if type(value) == General]
-        opposing_pieces = []
-
-        # Is moving party currently in check and needs to escape
-        for general in general_positions: #Locate generals on board
-            if self._board[general].get_side() == self._player_turn: #Look at general of moving side
-                moving_side_general = general
-
-        #Scan at all other board positions
-        for key, value in self._board.items():
-            if value != 0 and value.get_side() != self._player_turn and type(value) not in {General, Guard}:  #If a pos is occupied by opposing side
-
-                #Exclude pieces that are too far away so as to not blow up the computer
-                if self._board[moving_side_general].get_side() == "BLUE":
-                    if (key[-1] not in {"1", "2", "3"} or
-                        type(self._board[key]) in {Chariot, Cannon}):
-                        opposing_pieces.append(value)
-                elif self._board[moving_side_general].get_side() == "RED":
-                    if (
-                        ( len(key) != 3 or (len(key) == 2 and key[-1] not in {"9", "8"}) ) or
-                        (type(self._board[key]) in {Chariot, Cannon})
-                        ):
-                        opposing_pieces.append(value)
-
-        for value in opposing_pieces: #Look at the pieces that could place the general in check
-            #if moving moving_side_general's curent pos subject to capture
-            if moving_side_general in value.check_available_moves(self._board).keys():
-                self._in_check = self._board[moving_side_general].get_side() #Update status of in_check
-                if len(self._board[moving_side_general].check_available_moves(self._board).keys()) == 0: #If no immediate available moves, CHECKMATE
-                    if self._player_turn == 'RED':
-                        self._game_state = "BLUE_WON"
-                        return False
-                    elif self._player_turn == 'BLUE':
-                        self._game_state = "RED_WON"
-                        return False
-                #No moves to another position where general would be placed in check
-                elif destination in value.check_available_moves(self._board).keys():
-                    return False
+        origin and destination of a move already recorded on the board, return
+        False if the move leaves the moving side's general capturable, True
+        otherwise.
+        """
+        moving_side = self._board[destination].get_side()
+        moving_side_general = self._generals[moving_side]
+        if self.is_square_attacked(moving_side_general, self._opposing_side(moving_side)):
+            return False
+        return True
+
+    def _switch_turn(self):
+        """
+        Hand the move to the other player.
+        """
+        self._player_turn = self._opposing_side(self._player_turn)
+
+    def _opposing_side(self, side):
+        """
+        Take side, return the other side.
+        """
+        if side == 'BLUE':
+            return 'RED'
+        return 'BLUE'
+
+    def is_square_attacked(self, square, by_side):
+        """
+        Take board index and attacking side, return True if any piece of
+        by_side could capture on that square, False otherwise. Stops at the
+        first attacker _attacker_squares() finds.
+        """
+        for _ in self._attacker_squares(square, by_side):
+            return True
+        return False
+
+    def _attacker_squares(self, square, by_side):
+        """
+        Take board index and attacking side, yield the board index of each
+        piece of by_side that could capture on that square. Works back from
+        the square: soldier and palace origins, horse and elephant origins
+        with their legs, then chariots and cannons along each line. The one
+        copy of the reverse attack rules, shared by is_square_attacked() and
+        _attackers().
+        """
+        board = self._board
+
+        #Soldiers, then general and guards (palace steps are symmetric)
+        for origin in SOLDIER_ATTACKS[by_side][square]:
+            value = board[origin]
+            if value != 0 and type(value) == Soldier and value.get_side() == by_side:
+                yield origin
+        for origin in PALACE_MOVES[by_side][square]:
+            value = board[origin]
+            if value != 0 and type(value) in (General, Guard) and value.get_side() == by_side:
+                yield origin
+
+        #Horses and elephants whose legs are clear
+        for origin, leg in HORSE_ATTACKS[square]:
+            value = board[origin]
+            if (value != 0 and type(value) == Horse and value.get_side() == by_side and
+                    board[leg] == 0):
+                yield origin
+        for origin, first_leg, second_leg in ELEPHANT_ATTACKS[square]:
+            value = board[origin]
+            if (value != 0 and type(value) == Elephant and value.get_side() == by_side and
+                    board[first_leg] == 0 and board[second_leg] == 0):
+                yield origin
+
+        #Chariot as first piece along a line, cannon as the piece after the screen
+        for ray in LINE_RAYS[square]:
+            screened = False
+            for pos in ray:
+                value = board[pos]
+                if value == 0:
+                    continue
+                if not screened:
+                    if type(value) == Chariot and value.get_side() == by_side:
+                        yield pos
+                    screened = True
+                else:
+                    if type(value) == Cannon and value.get_side() == by_side:
+                        yield pos
+                    break
+
+    def has_any_legal_move(self, side):
+        """
+        Take side, return True if it has at least one legal move other than a
+        pass, stopping at the first one found. A side in check tries the
+        likeliest evasions first (see _evasion_candidates()), then any other
+        move.
+        """
+        tried = set()
+        if self.is_general_attacked(side):
+            for move in self._evasion_candidates(side):
+                if move in tried:
+                    continue
+                if self._is_legal(side, *move):
+                    return True
+                tried.add(move)
+        for move in self.generate_moves(side):
+            if move not in tried and self._is_legal(side, *move):
+                return True
+        return False
+
+    def _is_legal(self, side, origin, destination):
+        """
+        Take side and a pseudo-legal move of its, return True if the move does
+        not leave the side's general capturable.
+        """
+        self.push_move(origin, destination)
+        legal = not self.is_general_attacked(side)
+        self.pop_move()
+        return legal
+
+    def _evasion_candidates(self, side):
+        """
+        Take side in check, yield pseudo-legal moves likely to end the check,
+        cheapest to find first: captures of a checking piece, moves onto the
+        squares between a checker and the general (a chariot's or cannon's
+        line, a horse's or elephant's legs), moves or captures of a cannon's
+        screen, then general moves. Moves may repeat.
+        """
+        board = self._board
+        general = self._generals[side]
+        checkers = self._attackers(general, self._opposing_side(side))
+        for checker in checkers:
+            for origin in self._attackers(checker, side):
+                yield (origin, checker)
+        for checker in checkers:
+            kind = type(board[checker])
+            if kind in (Chariot, Cannon):
+                blocks = LINES_BETWEEN[checker].get(general, ())
+            elif kind == Horse:
+                blocks = [leg for origin, leg in HORSE_ATTACKS[general] if origin == checker]
+            elif kind == Elephant:
+                blocks = [leg for origin, first_leg, second_leg in ELEPHANT_ATTACKS[general]
+                          if origin == checker for leg in (first_leg, second_leg)]
+            else:
+                blocks = ()
+            for square in blocks:
+                value = board[square]
+                if value == 0:
+                    for origin in self._attackers(square, side):
+                        yield (origin, square)
+                elif kind == Cannon and value.get_side() == side: #screen steps aside
+                    for destination in value.generate_moves(square, board):
+                        yield (square, destination)
+                elif kind == Cannon: #screen is taken
+                    for origin in self._attackers(square, side):
+                        yield (origin, square)
+        for destination in board[general].generate_moves(general, board):
+            yield (general, destination)
+
+def _search_table(evaluation):
+    """
+    Take evaluation.Evaluation, return the transposition table shared by
+    single-process searches of every game in this process scored with it,
+    creating it on first use. Scores stored under one evaluation are never
+    read by a search using another. The table is lockless, so searches
+    running in threads at the same time cannot read an entry half written
+    by another.
+    """
+    table = _SEARCH_TABLES.get(evaluation)
+    if table is None:
+        from transposition import TranspositionTable
+        table = _SEARCH_TABLES.setdefault(evaluation, TranspositionTable(16, lockless=True))
+    return table
+
+def _named_result(result):
+    """
+    Take search result dict with moves as board index pairs, return a copy
+    with 'move' and 'pv' in algebraic notation.
+    """
+    result = dict(result)
+    result['pv'] = [(SQUARE_NAMES[origin], SQUARE_NAMES[destination])
+                    for origin, destination in result['pv']]
+    result['move'] = result['pv'][0] if result['pv'] else None
+    return result
 
 ###############################################################################
 #Piece class
 ###############################################################################
 class Piece:
     """
-    Represent piece master class. Contains rules for permissible moves,
-    data members for _side, _position, and _available_moves.
+    Represent piece master class. Contains rules for permissible moves and
+    the _side and _code data members. Pieces are immutable flyweights: there
+    is one shared instance per piece type and side (see for_side()), the
+    position is held only by the board, and methods that need it take the
+    piece's board index.
     """
 
-    def __init__(self, side, position):
+    __slots__ = ('_side', '_code')
+
+    def __init__(self, side):
         """
-        Initalize piece with private data members _side, _position, and
-        _available_moves.
+        Initialize piece with private data members _side and _code. Use
+        for_side() to get the shared instance rather than creating new ones.
         """
-        self._side = side
-        self._position = position
-        self._available_moves = {}
+        object.__setattr__(self, '_side', side)
+        object.__setattr__(self, '_code', (1 if side == 'RED' else 8) + self._kind)
 
-    def get_position(self):
+    def __setattr__(self, name, value):
         """
-        Return position of piece outside the class.
+        Pieces are shared between boards and games, so they cannot change.
         """
-        return self._position
+        raise AttributeError("pieces are immutable")
 
-    def set_position(self, position):
+    def __reduce__(self):
         """
-        For setting position of piece outside the class. Used in move validation
-        by JanggiGame.make_move().
+        Pickle as the piece code, so unpickling returns the shared instance.
         """
-        self._position = position
+        return (piece_from_code, (self._code,))
+
+    @classmethod
+    def for_side(cls, side):
+        """
+        Take side, return the shared piece of this class for that side.
+        """
+        return _FLYWEIGHTS[(1 if side == 'RED' else 8) + cls._kind]
 
     def get_side(self):
         """
@@ -251,531 +895,260 @@ class Piece:
         """
         return self._side
 
-    def get_available_moves(self):
+    def get_kind(self):
         """
-        Return vlaue of the self._available_moves data member for use in move
-        validation by JanggiGame.make_move().
+        Return the piece kind (0-6) used to index per-piece-type tables such
+        as the Zobrist keys.
         """
-        return self._available_moves
+        return self._kind
 
-    def check_diagonal(self, destination):
+    def get_code(self):
         """
-        Take proposed destination position. Detect whether non-horse,
-        non-elephant piece is attempting to move diagonally. Return True if
-        proper move within palace, False otherwise.
+        Return compact piece code 1-14: 1 + kind for RED pieces, 8 + kind for
+        BLUE pieces.
         """
+        return self._code
 
-        #Diagonal moves - should only move diagonally within fortress, as permitted there
-        if type(self) in {General, Guard}:
-            if self._position not in {"e2","e9"}: #not moving from center of fortress, so anywhere else on board
-                    if (self._position[0] != destination[0]) and (self._position[-1] != destination[-1]): #making a diagonal move
-                        #not moving from outer corners to middle
-                        if  ((self._position in {"d1","d2","d3","e1","e3","f1","f2","f3"} and destination != "e2") or
-                            (self._position in {"d8","d9","d10","e8","e10","f8","f9","f10"} and destination != "e9")
-                            ):
-                            return False
-                        else:
-                            return True
-                    else:
-                        return True
-            else:
-                return True
+    def check_diagonal(self, origin, destination):
+        """
+        Take the piece's board index and proposed destination index. Detect
+        whether non-horse, non-elephant piece is attempting to move
+        diagonally. Return True if proper move along the diagonal lines of a
+        palace, False otherwise.
+        """
 
-        elif type(self) not in {General, Guard, Horse, Elephant}:
-            #code cannon logic here
-            if self._position[0] != destination[0] and self._position[-1] != destination[-1]:
-                if self._position in {"e9"} and destination in {"d8","d9","d10","e8","e10","f8","f9","f10"}:
-                    return True
-                elif self._position in {"e2"} and destination in {"d1","d2","d3","e1","e3","f1","f2","f3"}:
-                    return True
-                elif self._position in {"d1","d2","d3","e1","e3","f1","f2","f3"} and destination == "e2":
-                    return True
-                elif self._position in {"d8","d9","d10","e8","e10","f8","f9","f10"} and destination == "e9":
-                    return True
-                else:
-                    return False
-            else:
-                return True
-        else:
+        if type(self) in {Horse, Elephant}:
             return True
 
-    def check_available_moves(self, board):
+        #Diagonal moves - should only move diagonally within fortress, along its lines
+        if (origin % 9 != destination % 9) and (origin // 9 != destination // 9):
+            return destination in LINES_BETWEEN[origin]
+        return True
+
+    def _open_to(self, value):
         """
-        Take board as dictionary of all board spaces with current piece layout.
-        Compile dictinoary of board spaces that can be currently occupied or
-        captured by piece.
+        Take board value, return True if the piece may move there, i.e. the
+        square is empty or holds an opposing piece.
         """
-        self._available_moves = {} #Reset so it checks board each time anew
-        for key, value in board.items(): #Looking at the main board
-            if self.check_piece_rules(key, board) == True: #Meta-allowable by piece-specific rules
-                if self.check_diagonal(key) == True: #allowable diagonal within fortress
-                    if value == 0:  # Pos empty
-                        self._available_moves[key] = value
-                    elif value != 0: #Pos occupied
-                        if value.get_side() != self._side:  #Opposing side piece / capture
-                            self._available_moves[key] = value
-        return self._available_moves
+        return value == 0 or value.get_side() != self._side
 
 ###############################################################################
 # Specific Piece Classes
 ###############################################################################
 class General(Piece):
     """
-    Represent General piece. Contains rules for permissible moves, data members
-    for _side and _available_moves.
+    Represent General piece. Contains rules for permissible moves.
     """
 
-    def __init__(self, side, position):
-        """
-        Initalize piece with private data members _side, _position, and
-        _available_moves.
-        """
-        Piece.__init__(self, side, position)
-        self._side = side
-        self._position = position
-        self._available_moves = {}
+    __slots__ = ()
+    _kind = 0 #index into per-piece-type tables
 
     def get_token(self):
         """Testing: Tokens for printing board"""
         return (self._side[0].lower()+'GN')
 
-    def check_piece_rules(self, destination, board):
+    def check_piece_rules(self, origin, destination, board):
         """
-        Take destination, which is a string of algebraic notation of intended
-        move. Check rules specific to piece. Return True if move allowable,
-        False if not.
+        Take origin and destination, the board indices of the piece and of the
+        intended move, and the board. Check rules specific to piece. Return
+        True if move allowable, False if not.
 
         GENERAL: Only one space per move and only within palace. May move
         diagonally according to board lines within palace. May not place itself
         in check.
         """
-        # Move outside bounds of fortess for RED
-        if (self._side == "RED" and
-            (destination[0] not in ['d','e','f'] or
-            int(destination[-1]) not in (1, 2, 3))
-            ):
-                return False
-        # Move outside bounds of fortess for BLUE
-        elif (self._side == "BLUE" and
-            (destination[0] not in ['d','e','f'] or
-            int(destination[-1]) not in (0, 8, 9))
-            ):
-                return False
-        # Move would be >1 space along y-axis within fortress
-        elif ((int(destination[-1]) != int(self._position[-1])) and
-            (((int(destination[-1]) + int(self._position[-1])) %2 ) == 0)
-            ):
-                return False
-        # Move would be >1 space along x-axis within fortress
-        elif ((destination[0] == 'f' and self._position[0] == 'd') or
-            (destination[0] == 'd' and self._position[0] == 'f')
-            ):
-                return False
-        else:
-            return True
+        # One space within fortress, along its lines
+        return destination in PALACE_MOVES[self._side][origin]
+
+    def generate_moves(self, origin, board):
+        """
+        Take the piece's board index and board, return list of board indices
+        the piece can move to or capture on: one step along the lines of its
+        own palace.
+        """
+        return [pos for pos in PALACE_MOVES[self._side][origin]
+                if self._open_to(board[pos])]
 
 class Guard(Piece):
     """
-    Represent Guard piece. Contains rules for permissible moves, data members
-    for _side and _available_moves.
+    Represent Guard piece. Contains rules for permissible moves.
     """
-    def __init__(self, side, position):
-        """
-        Initalize piece with private data members _side, _position, and
-        _available_moves.
-        """
-        Piece.__init__(self, side, position)
-        self._side = side
-        self._position = position
-        self._available_moves = {}
+
+    __slots__ = ()
+    _kind = 1 #index into per-piece-type tables
 
     def get_token(self):
         """Testing: Tokens for printing board"""
         return (self._side[0].lower()+'GD')
 
-    def check_piece_rules(self, destination, board):
+    def check_piece_rules(self, origin, destination, board):
         """
-        Take destination, which is a string of algebraic notation of intended
-        move. Check rules specific to piece. Return True if move allowable,
-        False if not.
+        Take origin and destination, the board indices of the piece and of the
+        intended move, and the board. Check rules specific to piece. Return
+        True if move allowable, False if not.
 
         GUARD: Only one space per move and only within palace. May move
         diagonally according to board lines within palace. May not place General
         in check.
         """
-        # Move outside bounds of fortess for RED
-        if (self._side == "RED" and
-            (destination[0] not in ['d','e','f'] or
-            int(destination[-1]) not in (1, 2, 3))
-            ):
-                return False
-        # Move outside bounds of fortess for BLUE
-        elif (self._side == "BLUE" and
-            (destination[0] not in ['d','e','f'] or
-            int(destination[-1]) not in (0, 8, 9))
-            ):
-                return False
-        # Move would be >1 space along y-axis within fortress
-        elif ((int(destination[-1]) != int(self._position[-1])) and
-            (((int(destination[-1]) + int(self._position[-1])) %2 ) == 0)
-            ):
-                return False
-        # Move would be >1 space along x-axis within fortress
-        elif ((destination[0] == 'f' and self._position[0] == 'd') or
-            (destination[0] == 'd' and self._position[0] == 'f')
-            ):
-                return False
-        #If move within fortress and <1 space in any direction
-        else:
-            return True
+        # One space within fortress, along its lines
+        return destination in PALACE_MOVES[self._side][origin]
 
+    def generate_moves(self, origin, board):
+        """
+        Take the piece's board index and board, return list of board indices
+        the piece can move to or capture on: one step along the lines of its
+        own palace.
+        """
+        return [pos for pos in PALACE_MOVES[self._side][origin]
+                if self._open_to(board[pos])]
 
 class Horse(Piece):
     """
-    Represent Horse piece.  Contains rules for permissible moves, data members
-    for _side and _available_moves.
+    Represent Horse piece.  Contains rules for permissible moves.
     """
 
-    def __init__(self, side, position):
-        """
-        Initalize piece with private data members _side, _position, and
-        _available_moves.
-        """
-        Piece.__init__(self, side, position)
-        self._side = side
-        self._position = position
-        self._available_moves = {}
+    __slots__ = ()
+    _kind = 2 #index into per-piece-type tables
 
     def get_token(self):
         """Testing: Tokens for printing board"""
         return (self._side[0].lower()+'HO')
 
-    def check_piece_rules(self, destination, board):
+    def check_piece_rules(self, origin, destination, board):
         """
-        Take destination, which is a string of algebraic notation of intended
-        move. Check rules specific to piece. Return True if move allowable,
-        False if not.
+        Take origin and destination, the board indices of the piece and of the
+        intended move, and the board. Check rules specific to piece. Return
+        True if move allowable, False if not.
 
         HORSE: one step orthogonally then one step diagonally outward, with no
         jumping). A horse can be transposed with an adjacent elephant in the initial
         setup.
         """
+        leg = HORSE_LEGS[origin].get(destination)
+        if leg is None: #not a horse move from this square
+            return False
 
-        #Columns for indexing, algorithm for analyzing available moves, positions
-        cols = 'abcdefghi'
-        move_dict = {-19:[-9], -17:[-9], -11:[-1], -7:[1], 7:[-1], 11:[1], 17:[9], 19:[9]}
-        pos_list = [[key, value] for key, value in board.items()]
-
-        #Find index of origin position in index
-        for i in range(len(pos_list)):
-            if self._position == pos_list[i][0]:
-                origin_index = i
-
-        #Try each move in move algorithm
-        for key, value in move_dict.items():
-            move = origin_index + key
-            if (move) in range(0,90): #Move is on the board, but possibly outside 2-space radius fence
-
-                #are cols > 2 away in any direction?
-                for i in range(len(cols)):
-                    if cols[i] == pos_list[move][0][0]:
-                        move_col_index = i
-                    if cols[i] == self._position[0]:
-                        origin_col_index = i
-                if  (((origin_col_index - move_col_index) > 2) or
-                    ((move_col_index - origin_col_index) > 2)):
-                    if destination == pos_list[move][0]:
-                        return False
-
-                #are rows > 2 away in any direction?
-                elif len(pos_list[move][0]) == 2 and len(self._position) == 2: #moves < row 10
-                    if  (((int(pos_list[move][0][-1]) - int(self._position[-1])) > 2) or
-                        ((int(self._position[-1]) - int(pos_list[move][0][-1])) > 2)):
-                        if destination == pos_list[move][0]:
-                            return False
-                    else:
-                        if destination == pos_list[move][0]:  #destination within fence
-                            if board[pos_list[origin_index+value[0]][0]] == 0: #clear en route?
-                                return True
-                            else:
-                                return False
-
-                #Length of destination string is 3
-                elif len(pos_list[move][0]) == 3 and len(self._position) == 2: #moves == row 10
-                    if  (((int(pos_list[move][0][-2:]) - int(self._position[-1])) > 2) or
-                        ((int(self._position[-1]) - int(pos_list[move][0][-2:])) > 2)):
-                        if destination == pos_list[move][0]:
-                            return False
-                    else:
-                        if destination == pos_list[move][0]:  #destination within fence
-                            if board[pos_list[origin_index+value[0]][0]] == 0: #clear en route?
-                                return True
-                            else:
-                                return False
-
-                #Length of origin string is 3
-                elif len(pos_list[move][0]) == 2 and len(self._position) == 3: #moves == row 10
-                    if  (((int(pos_list[move][0][-1]) - int(self._position[-2:])) > 2) or
-                        ((int(self._position[-2:]) - int(pos_list[move][0][-1])) > 2)):
-                        if destination == pos_list[move][0]:
-                            return False
-                    else:
-                        if destination == pos_list[move][0]: #destination within fence
-                            if board[pos_list[origin_index+value[0]][0]] == 0:  #clear en route?
-                                return True
-                            else:
-                                return False
-                else: #not on board
-                    return False
+        #clear en route?
+        return board[leg] == 0
+
+    def generate_moves(self, origin, board):
+        """
+        Take the piece's board index and board, return list of board indices
+        the piece can move to or capture on, skipping targets whose leg square
+        is occupied.
+        """
+        return [pos for pos, leg in HORSE_MOVES[origin]
+                if board[leg] == 0 and self._open_to(board[pos])]
 
 class Elephant(Piece):
     """
-    Represent Elephant piece.  Contains rules for permissible moves, data members
-    for _side and _available_moves.
+    Represent Elephant piece.  Contains rules for permissible moves.
     """
 
-    def __init__(self, side, position):
-        """
-        Initalize piece with private data members _side, _position, and
-        _available_moves.
-        """
-        Piece.__init__(self, side, position)
-        self._side = side
-        self._position = position
-        self._available_moves = {}
+    __slots__ = ()
+    _kind = 3 #index into per-piece-type tables
 
     def get_token(self):
         """Testing: Tokens for printing board"""
         return (self._side[0].lower()+'EL')
 
-    def check_piece_rules(self, destination, board):
+    def check_piece_rules(self, origin, destination, board):
         """
-        Take destination, which is a string of algebraic notation of intended
-        move. Check rules specific to piece. Return True if move allowable,
-        False if not.
+        Take origin and destination, the board indices of the piece and of the
+        intended move, and the board. Check rules specific to piece. Return
+        True if move allowable, False if not.
 
         ELEPHANT: move one point orthogonally followed by two points diagonally
         away from their starting point, ending on the opposite corner of a 2×3
         rectangle. Like the horse, the elephant is blocked from moving by any
         intervening pieces.
         """
-        #Columns for indexing, algorithm for analyzing available moves, positions
-        cols = 'abcdefghi'
-        move_dict = {   -15:[-7,1], -21:[-11,-1], -25:[-17,-9], -29:[-19,-9],
-                        15:[7,-1], 21:[11,1], 25:[17,9], 29:[19,9]
-                    }
-        pos_list = [[key, value] for key, value in board.items()] #indexed list of positions
-
-        #Find index of origin position in index
-        for i in range(len(pos_list)):
-            if self._position == pos_list[i][0]:
-                origin_index = i
-
-        #Try each move in move algorithm
-        for key, value in move_dict.items():
-            move = origin_index + key
-            if (move) in range(0,90): #Move is on the board, but possibly outside 3-space radius fence
-
-                #are cols > 3 away in any direction?
-                for i in range(len(cols)):
-                    if cols[i] == pos_list[move][0][0]:
-                        move_col_index = i
-                    if cols[i] == self._position[0]:
-                        origin_col_index = i
-                if  (((origin_col_index - move_col_index) > 3) or
-                    ((move_col_index - origin_col_index) > 3)):
-                    if destination == pos_list[move][0]:
-                        return False
-
-                #are rows > 3 away in any direction?
-                elif len(pos_list[move][0]) == 2 and len(self._position) == 2: #moves < row 10
-                    if  (((int(pos_list[move][0][-1]) - int(self._position[-1])) > 3) or
-                        ((int(self._position[-1]) - int(pos_list[move][0][-1])) > 3)):
-                        if destination == pos_list[move][0]:
-                            return False
-                    else:
-                        if destination == pos_list[move][0]:  #destination within fence
-                            if board[pos_list[origin_index+value[0]][0]] == 0: #clear en route?
-                                if board[pos_list[origin_index+value[1]][0]] == 0: #clear en route?
-                                    return True
-                            else:
-                                return False
-
-                #Length of destination string is 3
-                elif len(pos_list[move][0]) == 3 and len(self._position) == 2: #moves == row 10
-                    if  (((int(pos_list[move][0][-2:]) - int(self._position[-1])) > 3) or
-                        ((int(self._position[-1]) - int(pos_list[move][0][-2:])) > 3)):
-                        if destination == pos_list[move][0]:
-                            return False
-                    else:
-                        if destination == pos_list[move][0]:  #destination within fence
-                            if board[pos_list[origin_index+value[0]][0]] == 0: #clear en route?
-                                if board[pos_list[origin_index+value[1]][0]] == 0: #clear en route?
-                                    return True
-                            else:
-                                return False
-
-                #Length of origin string is 3
-                elif len(pos_list[move][0]) == 2 and len(self._position) == 3: #moves == row 10
-                    if  (((int(pos_list[move][0][-1]) - int(self._position[-2:])) > 3) or
-                        ((int(self._position[-2:]) - int(pos_list[move][0][-1])) > 3)):
-                        if destination == pos_list[move][0]:
-                            return False
-                    else:
-                        if destination == pos_list[move][0]: #destination within fence
-                            if board[pos_list[origin_index+value[0]][0]] == 0:  #clear en route?
-                                if board[pos_list[origin_index+value[1]][0]] == 0: #clear en route?
-                                    return True
-                            else:
-                                return False
-                else: #not on board
-                    return False
+        legs = ELEPHANT_LEGS[origin].get(destination)
+        if legs is None: #not an elephant move from this square
+            return False
+        first_leg, second_leg = legs
+
+        #clear en route?
+        return board[first_leg] == 0 and board[second_leg] == 0
+
+    def generate_moves(self, origin, board):
+        """
+        Take the piece's board index and board, return list of board indices
+        the piece can move to or capture on, skipping targets with an occupied
+        square en route.
+        """
+        return [pos for pos, first_leg, second_leg in ELEPHANT_MOVES[origin]
+                if board[first_leg] == 0 and board[second_leg] == 0 and
+                self._open_to(board[pos])]
 
 class Chariot(Piece):
     """
-    Represent Chariot piece.  Contains rules for permissible moves, data members
-    for _side and _available_moves.
+    Represent Chariot piece.  Contains rules for permissible moves.
     """
 
-    def __init__(self, side, position):
-        """
-        Initalize piece with private data members _side, _position, and
-        _available_moves.
-        """
-        Piece.__init__(self, side, position)
-        self._side = side
-        self._position = position
-        self._available_moves = {}
+    __slots__ = ()
+    _kind = 4 #index into per-piece-type tables
 
     def get_token(self):
         """Testing: Tokens for printing board"""
         return (self._side[0].lower()+'CH')
 
-    def check_piece_rules(self, destination, board):
+    def check_piece_rules(self, origin, destination, board):
         """
-        Take destination, which is a string of algebraic notation of intended
-        move. Check rules specific to piece. Return True if move allowable,
-        False if not.
+        Take origin and destination, the board indices of the piece and of the
+        intended move, and the board. Check rules specific to piece. Return
+        True if move allowable, False if not.
 
         CHARIOT: moves and captures in a straight line either horizontally or
         vertically. Additionally, the chariot may move along the diagonal lines
         inside either palace, but only in a straight line.
         """
-        ##Can move in as many spaces orthogonally as long as not blocked
-        if destination[0] != self._position[0] and destination[-1] != self._position[-1]: #not orthogonal move
+        between = LINES_BETWEEN[origin].get(destination)
+        if between is None: #not a straight line
             return False
 
-        #Is orthogonal in direction, is destination clear en route?
-
-        #Moving right/increasing on row axis - this appears to be working
-        if destination[0] > self._position[0]:
-            cols = 'abcdefghi'
-            for i in range(len(cols)):
-                if len(destination) == 3: #moving along row 10
-                    pos = (cols[i]+destination[-2:]) #construct position string
-                elif len(destination) == 2:
-                    pos = (cols[i]+destination[-1]) #construct position string
-                if pos[0] > self._position[0] and cols[i] <= destination[0]:
-                    if board[pos] != 0:
-                        if board[pos] == board[destination]: #If the position is where we are heading
-                            if board[destination].get_side() == self._side:
-                                return False
-                            else:
-                                return True
-                        else:
-                            return False
-            return True
-
-        #Moving left/decreasing on row axis
-        elif destination[0] < self._position[0]:
-            cols = 'abcdefghi'
-            cols = cols[::-1] #reverse the string, since going right to left
-            for i in range(len(cols)):
-                if len(destination) == 3: #moving along row 10
-                    pos = (cols[i]+destination[-2:]) #construct position string
-                elif len(destination) == 2:
-                    pos = (cols[i]+destination[-1]) #construct position string
-                if pos[0] < self._position[0] and cols[i] >= destination[0]:
-                    if board[pos] != 0:
-                        if board[pos] == board[destination]: #If the position is where we are heading
-                            if board[destination].get_side() == self._side:
-                                return False
-                            else:
-                                return True
-                        else:
-                            return False
-            return True
-
-        # Moving down/increasing on column axis
-        elif ((destination[-1] > self._position[-1] and len(destination) != 3 and len(self._position) != 3) or (len(destination) == 3 and len(self._position) == 2)):
-            if len(destination) == 3:
-                for i in range (10 - int(self._position[-1])): #When dest is row 10 - difference of spaces between origin and destination
-                    pos = (self._position[0]+str((i+1) + int(self._position[-1]))) #Construct position string
-                    if board[pos] != 0: #if occupied
-                        if board[pos] == board[destination]: #If the position is where we are heading
-                            return True
-                        else: #Intermediate position blocked
-                            return False
-                return True
-            else:
-                for i in range (int(destination[-1]) - int(self._position[-1])): # Dest is not row 10 - difference of spaces between origin and destination
-                    pos = (self._position[0]+str((i+1) + int(self._position[-1]))) #Construct position string
-                    if board[pos] != 0:
-                        if board[pos] == board[destination]: #If the position is where we are heading
-                            return True
-                        else: #Intermediate position blocked
-                            return False
-                return True
+        #Is destination clear en route?
+        for pos in between:
+            if board[pos] != 0:
+                return False
+        return True
 
-        # Moving up/decreasing on column axis
-        elif ((destination[-1] < self._position[-1] and len(destination) != 3 and len(self._position) != 3) or (len(destination) == 2 and len(self._position) == 3)):
-            if len(self._position) == 3:
-                for i in range (10 - int(destination[-1])): #When origin is row 10 - difference of spaces between origin and destination
-                    pos = (self._position[0]+str( int(self._position[-2:]) - (i+1) )) #Construct position string
-                    if board[pos] != 0: #if occupied
-                        if board[pos] == board[destination]: #If the position is where we are heading
-                            return True
-                        else:
-                            return False
-                return True
-            else:
-                for i in range (int(self._position[-1]) - int(destination[-1])): #difference of spaces between origin and destination
-                    pos = (self._position[0]+str(int(self._position[-1])-(i+1)))
-                    #print(pos)
-                    if board[pos] != 0:
-                        if board[pos] == board[destination]:
-                            return True
-                        else:
-                            return False
-                return True
-        else:
-            return True
+    def generate_moves(self, origin, board):
+        """
+        Take the piece's board index and board, return list of board indices
+        the piece can move to or capture on, walking each ray until the first
+        occupied square.
+        """
+        moves = []
+        for ray in LINE_RAYS[origin]:
+            for pos in ray:
+                value = board[pos]
+                if value == 0:
+                    moves.append(pos)
+                else:
+                    if value.get_side() != self._side: #capture
+                        moves.append(pos)
+                    break
+        return moves
 
 class Cannon(Piece):
     """
-    Represent Cannon piece. Contains rules for permissible moves, data members
-    for _side and _available_moves.
+    Represent Cannon piece. Contains rules for permissible moves.
     """
 
-    def __init__(self, side, position):
-        """
-        Initalize piece with private data members _side, _position, and
-        _available_moves.
-        """
-        Piece.__init__(self, side, position)
-        self._side = side
-        self._position = position
-        self._available_moves = {}
+    __slots__ = ()
+    _kind = 5 #index into per-piece-type tables
 
     def get_token(self):
         """Testing: Tokens for printing board"""
         return (self._side[0].lower()+'CN')
 
-    def check_piece_rules(self, destination, board):
+    def check_piece_rules(self, origin, destination, board):
         """
-        Take destination, which is a string of algebraic notation of intended
-        move. Check rules specific to piece. Return True if move allowable,
-        False if not.
+        Take origin and destination, the board indices of the piece and of the
+        intended move, and the board. Check rules specific to piece. Return
+        True if move allowable, False if not.
 
         CANNON: Moves by jumping another piece horizontally or vertically.
         The jump can be performed over any distance provided that there is exactly
@@ -787,61 +1160,42 @@ class Cannon(Piece):
         piece in the centre (i.e. it can only happen if the cannon is at a corner of
         the palace).
         """
-        #Set up list of positions
-        pos_list = [[key, value] for key, value in board.items()] #indexed list of positions
-        for i in range(len(pos_list)): #find index of origin position in index
-            if self._position == pos_list[i][0]:
-                origin_index = i
-
-        #Create list of moves down y-axis
-        below_list = []
-        below = origin_index + 9
-        while below < len(pos_list):
-            below_list.append(below)
-            below += 9
-        below_list.sort()
-
-        #Create list of moves up y-axis
-        above_list = []
-        above = origin_index - 9
-        while above > 0:
-            above_list.append(above)
-            above -= 9
-        above_list.sort(reverse=True)
-
-        #Create list of moves left on x-axis
-        left_list = []
-        left = (origin_index % 9) #e.g., will be 4 when orig is 50
-        while left > -1  : #the origin % 9 will give you how many spaces from left it is
-            if left != 0:
-                left_list.append(origin_index - left)
-            left -= 1
-        left_list.sort(reverse=True)
-
-        #Create list of moves left on x-axis
-        right_list = []
-        right = (9 - (origin_index% 9)) #e.g., will be 7 when oi is 20
-        while right > 0  : #the origin % 9 will give you how many spaces from left it is
-            if right != 0:
-                right_list.append(origin_index + right)
-            right -= 1
-        right_list.sort()
-
-        mega_cannon_move_list = [above_list, below_list, left_list, right_list]
-        for list in mega_cannon_move_list:
-            intermediate_count = 0
-            for i in list:
-                if pos_list[i][1] != 0 and pos_list[i][0] != destination: #there is something there, but not yet at destination
-                    intermediate_count += 1
-                elif pos_list[i][0] == destination and intermediate_count == 1:
-                    return True
-                elif intermediate_count > 1 or (pos_list[i][0] == destination and intermediate_count == 0):
-                    return False
+        between = LINES_BETWEEN[origin].get(destination)
+        if between is None: #not a straight line
+            return False
+
+        intermediate_count = 0
+        for pos in between:
+            if board[pos] != 0:
+                intermediate_count += 1
+        return intermediate_count == 1
+
+    def generate_moves(self, origin, board):
+        """
+        Take the piece's board index and board, return list of board indices
+        the piece can move to or capture on: along each ray, the squares past
+        the first piece (the screen) up to and including the next piece if it
+        is an opposing one.
+        """
+        moves = []
+        for ray in LINE_RAYS[origin]:
+            screened = False
+            for pos in ray:
+                value = board[pos]
+                if not screened:
+                    if value != 0:
+                        screened = True
+                elif value == 0:
+                    moves.append(pos)
+                else:
+                    if value.get_side() != self._side: #capture
+                        moves.append(pos)
+                    break
+        return moves
 
 class Soldier(Piece):
     """
-    Represent Soldier piece.  Contains rules for permissible moves, data members
-    for _side and _available_moves.
+    Represent Soldier piece.  Contains rules for permissible moves.
 
     SOLDIER: move and capture one point either straight forward or sideways
     (unlike xiangqi, where soldiers must cross the "river" to be able to move
@@ -850,60 +1204,56 @@ class Soldier(Piece):
     when within the enemy palace.
     """
 
-    def __init__(self, side, position):
-        """
-        Initalize piece with private data members _side, _position, and
-        _available_moves.
-        """
-        Piece.__init__(self, side, position)
-        self._side = side
-        self._position = position
-        self._available_moves = {}
+    __slots__ = ()
+    _kind = 6 #index into per-piece-type tables
 
     def get_token(self):
         """Testing: Tokens for printing board"""
         return (self._side[0].lower()+'SO')
 
-    def check_piece_rules(self, destination, board):
+    def check_piece_rules(self, origin, destination, board):
         """
-        Take destination, which is a string of algebraic notation of intended
-        move. Check rules specific to piece. Return True if move allowable,
-        False if not.
+        Take origin and destination, the board indices of the piece and of the
+        intended move, and the board. Check rules specific to piece. Return
+        True if move allowable, False if not.
         """
+        #One row forward, one column sideways, or diagonally forward along
+        #...the lines of the enemy palace
+        return destination in SOLDIER_MOVES[self._side][origin]
 
-        cols = 'abcdefghi'
+    def generate_moves(self, origin, board):
+        """
+        Take the piece's board index and board, return list of board indices
+        the piece can move to or capture on.
+        """
+        return [pos for pos in SOLDIER_MOVES[self._side][origin]
+                if self._open_to(board[pos])]
 
-        #No moves to own-side position - not really sure why this is here
-        if board[destination] != 0 and board[destination].get_side() == self._side:
-            return False
 
-        #Both on row 10
-        elif len(self._position) == 3:
-            if len(destination) == 3: #both on row 10
-                for i in range(len(cols)-1): #going right up to last col
-                    if (board[destination] != 0 and board[destination].get_side() != self._position) or board[destination] == 0:
-                        if cols[i] == self._position[0] and cols[i+1] == destination[0]:  #dest is 1 to right of position
-                            return True
-                        elif cols[i] == destination[0] and cols[i+1] == self._position[0]: #dest is 1 to left of position
-                            return True
-            elif destination[0] == self._position[0]: #same column
-                if destination[1] == '9':
-                    if (board[destination] != 0 and board[destination].get_side() != self._position) or board[destination] == 0:
-                        return True
-
-        elif len(self._position) == 2:
-
-            if board[self._position].get_side() == 'BLUE':
-                if int(self._position[-1]) == int(destination[-1])+1 and len(destination) != 3: # dest is one row above
-                    return True
+#Move lists shared by every game in the process: per (hash, square) for
+#...make_move(), per (hash, side) for legal_moves()/all_legal_moves()
+_MOVE_CACHE = MoveCache()
+_LEGAL_MOVE_CACHE = MoveCache()
 
-            elif board[self._position].get_side() == 'RED':
-                if int(self._position[-1]) == (int(destination[-1])-1):  # dest is one row below
-                    return True
+#Transposition tables shared by single-process searches per Evaluation, created
+#...on first search() and dropped with the evaluation
+_SEARCH_TABLES = weakref.WeakKeyDictionary()
 
-            for i in range(len(cols)-1): #going right up to last col
-                if (board[destination] != 0 and board[destination].get_side() != self._position) or board[destination] == 0:
-                    if cols[i] == self._position[0] and cols[i+1] == destination[0]:  #dest is 1 to right of position
-                        return True
-                    elif cols[i] == destination[0] and cols[i+1] == self._position[0]: #dest is 1 to left of position
-                        return True
+#Exchange values per _kind: default material values with the general above all material
+EXCHANGE_VALUES = (10000,) + DEFAULT_EVALUATION.get_material()[1:]
+
+#Piece classes in _kind order
+PIECE_TYPES = (General, Guard, Horse, Elephant, Chariot, Cannon, Soldier)
+
+
+#Shared piece instances indexed by piece code (0 is the empty square)
+_FLYWEIGHTS = ((None,) + tuple(piece_class('RED') for piece_class in PIECE_TYPES) +
+               tuple(piece_class('BLUE') for piece_class in PIECE_TYPES))
+
+
+def piece_from_code(code):
+    """
+    Take piece code 1-14 (see Piece.get_code()), return the shared piece of
+    that type and side.
+    """
+    return _FLYWEIGHTS[code]
@@ -0,0 +1,116 @@
+# Description:  Position evaluation: material value per piece type plus a
+#               piece-square table per piece type, loaded from a JSON file
+#               (evaluation.json by default). JanggiGame keeps the score of
+#               its position up to date on every move and undo with
+#               square_values(), so game.evaluate() is O(1).
+#
+#               File format: {"material": {piece type: value},
+#               "tables": {piece type: 10 rows of 9 values}} for the piece
+#               types in KINDS. Tables are from RED's side: the first row is
+#               RED's back rank (rank 1); BLUE uses them mirrored top to
+#               bottom.
+
+import json
+import os
+
+KINDS = ('General', 'Guard', 'Horse', 'Elephant', 'Chariot', 'Cannon', 'Soldier') #by piece kind
+EVALUATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'evaluation.json')
+
+
+class Evaluation:
+    """
+    Represent material values and piece-square tables. Take material value
+    per piece kind, a 90-value table per piece kind (RED's side, board index
+    order) and whether games using it should validate the incremental score
+    against a full recount on every evaluate().
+    """
+
+    def __init__(self, material, tables, validate=False):
+        """
+        Initialize with private data members _material, _tables, _validate
+        and _square_values (per piece code, the signed value of that piece on
+        each square: positive for RED). Raise ValueError if there is not one
+        value per kind or 90 table entries per kind.
+        """
+        if len(material) != len(KINDS) or len(tables) != len(KINDS):
+            raise ValueError("need material and a table for each of " + ", ".join(KINDS))
+        if any(len(table) != 90 for table in tables):
+            raise ValueError("piece-square tables must have 90 entries")
+        self._material = tuple(int(value) for value in material)
+        self._tables = tuple(tuple(int(value) for value in table) for table in tables)
+        self._validate = validate
+        square_values = [None] * 15 #indexed by piece code, 0 = empty
+        for kind, table in enumerate(self._tables):
+            red = [self._material[kind] + value for value in table]
+            blue = [-red[(9 - index // 9) * 9 + index % 9] for index in range(90)]
+            square_values[1 + kind] = tuple(red)
+            square_values[8 + kind] = tuple(blue)
+        self._square_values = tuple(square_values)
+
+    @classmethod
+    def load(cls, path=EVALUATION_FILE, validate=False):
+        """
+        Take path of a JSON evaluation file and the validate flag, return
+        the Evaluation. Raise ValueError if the file is malformed.
+        """
+        with open(path) as handle:
+            try:
+                data = json.load(handle)
+                material = [data['material'][kind] for kind in KINDS]
+                tables = [[value for row in data['tables'][kind] for value in row]
+                          for kind in KINDS]
+            except (ValueError, KeyError, TypeError) as error:
+                raise ValueError("%s: not an evaluation file (%s)" % (path, error))
+        return cls(material, tables, validate)
+
+    def save(self, path):
+        """
+        Take path, write the material values and tables as a JSON file that
+        load() reads back.
+        """
+        data = {
+            'material': dict(zip(KINDS, self._material)),
+            'tables': {kind: [list(table[row * 9:row * 9 + 9]) for row in range(10)]
+                       for kind, table in zip(KINDS, self._tables)},
+        }
+        with open(path, 'w') as handle:
+            json.dump(data, handle, indent=2)
+
+    def get_material(self):
+        """
+        Return tuple of material values by piece kind.
+        """
+        return self._material
+
+    def get_table(self, kind):
+        """
+        Take piece kind (index into KINDS), return its 90-value table from
+        RED's side.
+        """
+        return self._tables[kind]
+
+    def is_validating(self):
+        """
+        Return True if games should check the incremental score against a
+        full recount.
+        """
+        return self._validate
+
+    def square_values(self):
+        """
+        Return tuple indexed by piece code (see Piece.get_code(); entry 0 is
+        None) of 90-value tuples: material plus table value of that piece on
+        each square, positive for RED pieces and negative for BLUE.
+        """
+        return self._square_values
+
+    def score_codes(self, codes):
+        """
+        Take 90 piece codes, return the score of the position from scratch,
+        positive when RED is ahead.
+        """
+        values = self._square_values
+        return sum(values[code][index] for index, code in enumerate(codes) if code)
+
+
+DEFAULT_EVALUATION = Evaluation.load()
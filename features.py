@@ -0,0 +1,162 @@
+# Description:  NumPy batch encoding of Janggi positions for analytics and
+#               model training. A batch of games is turned into an (N, 90)
+#               array of piece codes in one call, then into (N, 14, 10, 9)
+#               one-hot planes, and material, palace occupancy and mobility
+#               are computed for the whole batch with array operations.
+#               Requires numpy.
+
+import numpy as np
+
+from JanggiGame import PIECE_TYPES, General, Guard, Horse, Elephant, Chariot, Cannon, Soldier
+from move_tables import (HORSE_MOVES, ELEPHANT_MOVES, LINE_RAYS, PALACE_MOVES,
+                         SOLDIER_MOVES, RED_PALACE, BLUE_PALACE)
+
+SIDES = ('RED', 'BLUE')
+PLANES = 2 * len(PIECE_TYPES) #plane = code - 1: RED kinds 0-6, BLUE kinds 7-13
+EMPTY_SQUARE = 90 #padding index, points at an always-empty extra column
+
+
+def piece_codes(games):
+    """
+    Take iterable of JanggiGame objects, return uint8 array of shape (N, 90)
+    holding each square's piece code (see Piece.get_code()).
+    """
+    buffer = b''.join(game.get_piece_codes() for game in games)
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(-1, 90)
+
+
+def encode_planes(codes):
+    """
+    Take (N, 90) piece code array, return uint8 array of shape (N, 14, 10, 9)
+    with one plane per piece type and side. Plane index is code - 1, so RED
+    pieces fill planes 0-6 and BLUE pieces planes 7-13 in PIECE_TYPES order.
+    Row 0 of each plane is board row 1.
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    planes = codes[:, None, :] == np.arange(1, PLANES + 1, dtype=np.uint8)[None, :, None]
+    return planes.reshape(len(codes), PLANES, 10, 9).astype(np.uint8)
+
+
+def encode_positions(games):
+    """
+    Take iterable of JanggiGame objects, return their (N, 14, 10, 9) planes.
+    """
+    return encode_planes(piece_codes(games))
+
+
+def material_counts(codes):
+    """
+    Take (N, 90) piece code array, return int array of shape (N, 14) with the
+    number of pieces per plane (piece type and side).
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    counts = np.zeros((len(codes), PLANES + 1), dtype=np.int64)
+    rows = np.repeat(np.arange(len(codes)), 90)
+    np.add.at(counts, (rows, codes.ravel()), 1)
+    return counts[:, 1:]
+
+
+def material_balance(codes, values):
+    """
+    Take (N, 90) piece code array and sequence of 7 values in PIECE_TYPES
+    order, return (N,) array of RED material minus BLUE material.
+    """
+    counts = material_counts(codes)
+    values = np.asarray(values)
+    return counts[:, :7] @ values - counts[:, 7:] @ values
+
+
+def palace_occupancy(codes):
+    """
+    Take (N, 90) piece code array, return int array of shape (N, 2, 2):
+    [position, palace (RED, BLUE), side (RED, BLUE)] piece counts.
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    occupancy = np.zeros((len(codes), 2, 2), dtype=np.int64)
+    for palace_index, palace in enumerate((RED_PALACE, BLUE_PALACE)):
+        squares = codes[:, sorted(palace)]
+        occupancy[:, palace_index, 0] = ((squares >= 1) & (squares <= 7)).sum(axis=1)
+        occupancy[:, palace_index, 1] = (squares >= 8).sum(axis=1)
+    return occupancy
+
+
+def _entries(per_square, piece_class, side):
+    """
+    Take per-square move table entries (target, legs...), piece class and
+    side, return (origins, targets, legs) arrays over every entry, with legs
+    padded to two columns by EMPTY_SQUARE.
+    """
+    origins, targets, legs = [], [], []
+    for origin in range(90):
+        for entry in per_square[origin]:
+            if not isinstance(entry, tuple):
+                entry = (entry,)
+            origins.append(origin)
+            targets.append(entry[0])
+            legs.append(list(entry[1:]) + [EMPTY_SQUARE] * (3 - len(entry)))
+    return (np.array(origins, dtype=np.intp), np.array(targets, dtype=np.intp),
+            np.array(legs, dtype=np.intp).reshape(-1, 2), piece_class, side)
+
+
+def _line_entries():
+    """
+    Return (origins, targets, between) arrays for every origin/target pair
+    along a line, with the squares between padded to 8 columns by
+    EMPTY_SQUARE.
+    """
+    origins, targets, between = [], [], []
+    for origin in range(90):
+        for ray in LINE_RAYS[origin]:
+            for i, target in enumerate(ray):
+                origins.append(origin)
+                targets.append(target)
+                between.append(list(ray[:i]) + [EMPTY_SQUARE] * (8 - i))
+    return (np.array(origins, dtype=np.intp), np.array(targets, dtype=np.intp),
+            np.array(between, dtype=np.intp))
+
+
+#Leaper tables flattened once at import time, per side
+_LEAPERS = []
+for _side in SIDES:
+    _LEAPERS.append(_entries(HORSE_MOVES, Horse, _side))
+    _LEAPERS.append(_entries(ELEPHANT_MOVES, Elephant, _side))
+    _LEAPERS.append(_entries(PALACE_MOVES[_side], General, _side))
+    _LEAPERS.append(_entries(PALACE_MOVES[_side], Guard, _side))
+    _LEAPERS.append(_entries(SOLDIER_MOVES[_side], Soldier, _side))
+_LINES = _line_entries()
+
+
+def _code(piece_class, side):
+    """
+    Take piece class and side, return its piece code.
+    """
+    return 1 + PIECE_TYPES.index(piece_class) + (7 if side == 'BLUE' else 0)
+
+
+def mobility(codes):
+    """
+    Take (N, 90) piece code array, return int array of shape (N, 2) with the
+    number of pseudo-legal moves for RED and BLUE in each position (the
+    same moves JanggiGame.generate_moves() lists), computed from the move
+    tables for the whole batch at once.
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    padded = np.concatenate([codes, np.zeros((len(codes), 1), dtype=np.uint8)], axis=1)
+    sides = np.where(padded == 0, -1, (padded.astype(np.int16) - 1) // 7) #-1 empty, 0 RED, 1 BLUE
+    result = np.zeros((len(codes), 2), dtype=np.int64)
+
+    for origins, targets, legs, piece_class, side in _LEAPERS:
+        side_index = SIDES.index(side)
+        moves = ((padded[:, origins] == _code(piece_class, side)) &
+                 (padded[:, legs] == 0).all(axis=2) &
+                 (sides[:, targets] != side_index))
+        result[:, side_index] += moves.sum(axis=1)
+
+    origins, targets, between = _LINES
+    screens = (padded[:, between] != 0).sum(axis=2) #pieces between origin and target
+    for side_index, side in enumerate(SIDES):
+        open_target = sides[:, targets] != side_index
+        chariot = (padded[:, origins] == _code(Chariot, side)) & (screens == 0)
+        cannon = (padded[:, origins] == _code(Cannon, side)) & (screens == 1)
+        result[:, side_index] += ((chariot | cannon) & open_target).sum(axis=1)
+    return result
@@ -0,0 +1,216 @@
+# Description:  Streaming reader and writer for a line-oriented Janggi game
+#               record format. Everything is generator based, so files of
+#               any size are processed one game at a time. Gzip input (path
+#               or binary stream) is recognised by its magic bytes; paths
+#               ending in .gz are written through gzip.
+#
+#               A record is a block of header lines, move lines and a result
+#               line, with games separated by blank lines:
+#
+#                   [Event "Club match"]
+#                   [FEN "..."]              (optional start position)
+#                   c7-c6 c1-d3 b8-b1 a1-b1
+#                   BLUE_WON
+#
+#               Moves use the algebraic notation make_move() accepts; a pass
+#               is written with origin == destination. The result line is
+#               one of UNFINISHED, RED_WON, BLUE_WON.
+
+import collections
+import copy
+import gzip
+import io
+import re
+
+from notation import INITIAL_FEN
+from replay import replay_game
+
+RESULTS = ('UNFINISHED', 'RED_WON', 'BLUE_WON')
+MOVES_PER_LINE = 10
+GZIP_MAGIC = b'\x1f\x8b'
+
+GameRecord = collections.namedtuple('GameRecord', ['headers', 'moves', 'result'])
+GameRecord.__doc__ = """
+One recorded game: dict of headers, list of (origin, destination) moves in
+algebraic notation and result (one of RESULTS, or None if not recorded).
+"""
+
+_HEADER = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]$')
+_ESCAPE = re.compile(r'\\(.)')
+_MOVE = re.compile(r'^([a-i](?:10|[1-9]))-([a-i](?:10|[1-9]))$')
+
+
+class RecordError(ValueError):
+    """
+    Raised when a game record file cannot be parsed. Carries the line
+    number of the offending line.
+    """
+
+    def __init__(self, message, line_number):
+        """
+        Initialize with message and line number.
+        """
+        ValueError.__init__(self, "line %d: %s" % (line_number, message))
+        self.line_number = line_number
+
+
+def _is_gzip(stream):
+    """
+    Take binary stream, return True if it starts with the gzip magic bytes.
+    The bytes are peeked, or read and sought back, so nothing is consumed;
+    a stream that can do neither is taken as plain text.
+    """
+    if hasattr(stream, 'peek'):
+        return stream.peek(2)[:2] == GZIP_MAGIC
+    if stream.seekable():
+        position = stream.tell()
+        head = stream.read(2)
+        stream.seek(position)
+        return head == GZIP_MAGIC
+    return False
+
+
+def _open(source, mode):
+    """
+    Take path or file object and 'r'/'w' mode, return (text file object,
+    function to call when done with it). Gzip is detected by magic bytes
+    when reading and by a .gz path when writing. Binary file objects are
+    wrapped for text, and the wrapper is detached rather than closed when
+    done, so the caller's file stays open. Text file objects are returned
+    unchanged.
+    """
+    if isinstance(source, str):
+        if mode == 'r':
+            with open(source, 'rb') as probe:
+                compressed = probe.read(2) == GZIP_MAGIC
+        else:
+            compressed = source.endswith('.gz')
+        if compressed:
+            handle = gzip.open(source, mode + 't', encoding='utf-8', newline='')
+        else:
+            handle = open(source, mode, encoding='utf-8', newline='')
+        return handle, handle.close
+    if isinstance(source, (io.RawIOBase, io.BufferedIOBase)):
+        stream = source
+        if mode == 'r' and _is_gzip(source):
+            stream = gzip.GzipFile(fileobj=source, mode='rb')
+        handle = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+        def finish():
+            handle.detach() #flushes; leaves the caller's file open
+            if stream is not source:
+                stream.close() #the gzip layer only; its fileobj stays open
+        return handle, finish
+    return source, lambda: None
+
+
+def parse_lines(lines):
+    """
+    Take iterable of text lines, yield a GameRecord for each game in them.
+    Raise RecordError on a malformed line.
+    """
+    headers = {}
+    moves = []
+    result = None
+    started = False
+    line_number = 0
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            if started:
+                yield GameRecord(headers, moves, result)
+                headers, moves, result, started = {}, [], None, False
+            continue
+        if result is not None:
+            raise RecordError("text after the result line", line_number)
+        started = True
+        if line.startswith('['):
+            if moves:
+                raise RecordError("header after the moves", line_number)
+            match = _HEADER.match(line)
+            if match is None:
+                raise RecordError("malformed header %r" % line, line_number)
+            headers[match.group(1)] = _ESCAPE.sub(r'\1', match.group(2))
+            continue
+        for token in line.split():
+            if token in RESULTS:
+                result = token
+                continue
+            match = _MOVE.match(token)
+            if match is None or result is not None:
+                raise RecordError("malformed move %r" % token, line_number)
+            moves.append((match.group(1), match.group(2)))
+    if started:
+        yield GameRecord(headers, moves, result)
+
+
+def read_games(source):
+    """
+    Take path or text/binary file object, plain or gzip, yield GameRecord
+    objects one game at a time.
+    """
+    handle, finish = _open(source, 'r')
+    try:
+        for record in parse_lines(handle):
+            yield record
+    finally:
+        finish()
+
+
+def format_game(record):
+    """
+    Take GameRecord, return its text block, ending in a blank line.
+    """
+    lines = []
+    for key, value in record.headers.items():
+        lines.append('[%s "%s"]' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"')))
+    tokens = [origin + '-' + destination for origin, destination in record.moves]
+    for start in range(0, len(tokens), MOVES_PER_LINE):
+        lines.append(' '.join(tokens[start:start + MOVES_PER_LINE]))
+    if record.result is not None:
+        lines.append(record.result)
+    return '\n'.join(lines) + '\n\n'
+
+
+def write_games(records, target):
+    """
+    Take iterable of GameRecord objects and a path (plain or .gz) or text
+    file object, write the records one at a time and return how many were
+    written.
+    """
+    handle, finish = _open(target, 'w')
+    count = 0
+    try:
+        for record in records:
+            handle.write(format_game(record))
+            count += 1
+    finally:
+        finish()
+    return count
+
+
+def record_from_game(game, headers=None):
+    """
+    Take JanggiGame and optional headers dict, return a GameRecord of the
+    moves played so far and the current game state. A FEN header with the
+    start position is added if the game did not start from the standard
+    setup.
+    """
+    headers = dict(headers or {})
+    start = copy.deepcopy(game)
+    while start.pop_move() is not None:
+        pass
+    fen = start.to_fen()
+    if fen != INITIAL_FEN:
+        headers['FEN'] = fen
+    return GameRecord(headers, game.get_move_history(), game.get_game_state())
+
+
+def validate_games(records):
+    """
+    Take iterable of GameRecord objects, yield (record, ReplayResult) pairs,
+    replaying each game through JanggiGame as it is read. A record's FEN
+    header, if present, is used as its start position.
+    """
+    for record in records:
+        yield record, replay_game(record.moves, record.headers.get('FEN'))
@@ -0,0 +1,282 @@
+# Description:  Opt-in instrumentation for JanggiGame.make_move(). While an
+#               Instrumentation is active, each attached game is switched to
+#               a subclass whose make_move() and step methods are counting
+#               and timing wrappers; when it is switched off the games get
+#               their own class back. Nothing is patched process-wide, so
+#               other games, searches and threads are unaffected and the
+#               disabled cost is zero.
+#
+#               Steps are timed only when called by make_move() itself (not
+#               from inside another step, search or perft). Piece-type
+#               counters count the generate_moves() calls (move cache
+#               misses) made for the attached games. The re-entrancy state
+#               is per thread, and counters are updated under a lock, so
+#               games used from several threads are counted correctly.
+#
+#               Usage:
+#                   with Instrumentation(game) as stats:
+#                       game.make_move('c7', 'c6')
+#                   print(stats.to_prometheus())
+
+import collections
+import contextlib
+import json
+import threading
+import time
+
+from JanggiGame import PIECE_TYPES
+
+#make_move() steps: (step name, JanggiGame method)
+STEPS = (
+    ('available_moves', '_available_moves'),
+    ('push_move', 'push_move'),
+    ('check_check', 'check_check'),
+    ('pop_move', 'pop_move'),
+    ('check_state', '_update_check_state'),
+)
+#JanggiGame methods that call one piece method: (method, piece method counted)
+PIECE_CALLS = (
+    ('_piece_moves', 'generate_moves'),
+)
+PIECE_METHODS = ('generate_moves',)
+
+
+class Instrumentation(contextlib.ContextDecorator):
+    """
+    Represent a set of make_move() step timers and piece-type counters for
+    the games attached to it. Take games to attach (more can be attached
+    with attach()). Use as a context manager or decorator, or call
+    enable()/disable(). Counters accumulate until reset().
+    """
+
+    def __init__(self, *games):
+        """
+        Initialize with private data members _games, _classes (instrumented
+        subclass per game class), _enabled, _lock, _local (per-thread
+        _in_move and _in_step state), _calls, _seconds, _results and
+        _piece_calls.
+        """
+        self._games = list(games)
+        self._classes = {}
+        self._enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._calls = collections.Counter()    #step -> calls
+        self._seconds = collections.Counter()  #step -> cumulative seconds
+        self._results = collections.Counter()  #'legal'/'illegal' -> make_move() calls
+        self._piece_calls = collections.Counter() #(piece class name, method) -> calls
+
+    def __enter__(self):
+        """
+        Enable and return the instrumentation.
+        """
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Disable the instrumentation.
+        """
+        self.disable()
+        return False
+
+    def is_enabled(self):
+        """
+        Return True if the attached games are instrumented.
+        """
+        return self._enabled
+
+    def attach(self, game):
+        """
+        Take game, instrument it too (at once if enabled).
+        """
+        if game not in self._games:
+            self._games.append(game)
+            if self._enabled:
+                self._instrument(game)
+
+    def enable(self):
+        """
+        Switch every attached game to its instrumented class.
+        """
+        if self._enabled:
+            return
+        self._enabled = True
+        for game in self._games:
+            self._instrument(game)
+
+    def disable(self):
+        """
+        Give every attached game its own class back.
+        """
+        if not self._enabled:
+            return
+        self._enabled = False
+        instrumented = {cls: original for original, cls in self._classes.items()}
+        for game in self._games:
+            original = instrumented.get(type(game))
+            if original is not None:
+                game.__class__ = original
+
+    def reset(self):
+        """
+        Zero every counter and timer.
+        """
+        with self._lock:
+            self._calls.clear()
+            self._seconds.clear()
+            self._results.clear()
+            self._piece_calls.clear()
+
+    def _instrument(self, game):
+        """
+        Take game, switch it to the instrumented subclass of its class.
+        """
+        original = type(game)
+        if original in self._classes.values():
+            return #already instrumented
+        if original not in self._classes:
+            self._classes[original] = self._subclass(original)
+        game.__class__ = self._classes[original]
+
+    def _subclass(self, original):
+        """
+        Take game class, return a subclass with make_move() and its step
+        methods wrapped.
+        """
+        methods = {'make_move': self._wrap_make_move(original.make_move)}
+        for step, name in STEPS:
+            methods[name] = self._wrap_step(step, getattr(original, name))
+        for name, piece_method in PIECE_CALLS:
+            methods[name] = self._wrap_piece(piece_method, methods.get(name, getattr(original, name)))
+        return type('Instrumented' + original.__name__, (original,), methods)
+
+    def _add(self, counter, key, amount=1):
+        """
+        Take counter, key and amount, add the amount under the lock.
+        """
+        with self._lock:
+            counter[key] += amount
+
+    def _wrap_make_move(self, function):
+        """
+        Take the original make_move(), return a wrapper timing the whole
+        call and counting legal and illegal moves.
+        """
+        local = self._local
+
+        def make_move(game, origin, destination):
+            if getattr(local, 'in_move', False): #re-entered; time only the outer call
+                return function(game, origin, destination)
+            local.in_move = True
+            start = time.perf_counter()
+            try:
+                legal = function(game, origin, destination)
+            finally:
+                elapsed = time.perf_counter() - start
+                local.in_move = False
+                with self._lock:
+                    self._seconds['make_move'] += elapsed
+                    self._calls['make_move'] += 1
+            self._add(self._results, 'legal' if legal else 'illegal')
+            return legal
+        return make_move
+
+    def _wrap_step(self, step, function):
+        """
+        Take step name and original method, return a wrapper that times the
+        call when make_move() makes it directly in this thread.
+        """
+        local = self._local
+
+        def wrapper(*args, **kwargs):
+            if not getattr(local, 'in_move', False) or getattr(local, 'in_step', False):
+                return function(*args, **kwargs)
+            local.in_step = True
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                local.in_step = False
+                with self._lock:
+                    self._seconds[step] += elapsed
+                    self._calls[step] += 1
+        return wrapper
+
+    def _wrap_piece(self, piece_method, function):
+        """
+        Take counted piece method name and the game method calling it (with
+        the board index of the piece as its first argument), return a
+        wrapper that counts the call by piece type.
+        """
+        def wrapper(game, origin, *args):
+            self._add(self._piece_calls, (type(game.get_board()[origin]).__name__, piece_method))
+            return function(game, origin, *args)
+        return wrapper
+
+    def get_stats(self):
+        """
+        Return dict with make_move() 'results', per-step 'steps' (calls and
+        seconds; 'validation' is make_move() time outside the timed steps)
+        and per-piece-type 'pieces' call counts.
+        """
+        with self._lock:
+            calls = collections.Counter(self._calls)
+            seconds = collections.Counter(self._seconds)
+            results = collections.Counter(self._results)
+            piece_calls = collections.Counter(self._piece_calls)
+        steps = {}
+        for step, _ in STEPS:
+            steps[step] = {'calls': calls[step], 'seconds': seconds[step]}
+        timed = sum(step['seconds'] for step in steps.values())
+        steps['validation'] = {'calls': calls['make_move'],
+                               'seconds': max(0.0, seconds['make_move'] - timed)}
+        steps['make_move'] = {'calls': calls['make_move'], 'seconds': seconds['make_move']}
+        pieces = {}
+        for piece_class in PIECE_TYPES:
+            pieces[piece_class.__name__] = {name: piece_calls[piece_class.__name__, name]
+                                            for name in PIECE_METHODS}
+        return {'results': {'legal': results['legal'], 'illegal': results['illegal']},
+                'steps': steps, 'pieces': pieces}
+
+    def to_json(self, indent=None):
+        """
+        Take optional indent, return get_stats() as a JSON string.
+        """
+        return json.dumps(self.get_stats(), indent=indent, sort_keys=True)
+
+    def to_prometheus(self, prefix='janggi'):
+        """
+        Take metric name prefix, return the stats in Prometheus text
+        exposition format.
+        """
+        stats = self.get_stats()
+        lines = [
+            '# HELP %s_make_move_total make_move() calls by result.' % prefix,
+            '# TYPE %s_make_move_total counter' % prefix,
+        ]
+        for result, count in sorted(stats['results'].items()):
+            lines.append('%s_make_move_total{result="%s"} %d' % (prefix, result, count))
+        lines += [
+            '# HELP %s_make_move_step_calls_total make_move() step calls.' % prefix,
+            '# TYPE %s_make_move_step_calls_total counter' % prefix,
+        ]
+        for step, values in stats['steps'].items():
+            lines.append('%s_make_move_step_calls_total{step="%s"} %d' % (prefix, step, values['calls']))
+        lines += [
+            '# HELP %s_make_move_step_seconds_total Cumulative time per make_move() step.' % prefix,
+            '# TYPE %s_make_move_step_seconds_total counter' % prefix,
+        ]
+        for step, values in stats['steps'].items():
+            lines.append('%s_make_move_step_seconds_total{step="%s"} %.9f' % (
+                prefix, step, values['seconds']))
+        lines += [
+            '# HELP %s_piece_calls_total Move generation calls by piece type.' % prefix,
+            '# TYPE %s_piece_calls_total counter' % prefix,
+        ]
+        for piece, methods in stats['pieces'].items():
+            for name, count in methods.items():
+                lines.append('%s_piece_calls_total{piece="%s",method="%s"} %d' % (
+                    prefix, piece, name, count))
+        return '\n'.join(lines) + '\n'
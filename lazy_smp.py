@@ -0,0 +1,147 @@
+# Description:  Multi-process search for JanggiGame (Lazy SMP). The main
+#               process and N - 1 helper processes all search the same root
+#               position, helpers one ply deeper on every other process and
+#               with shuffled quiet-move order, sharing one lockless
+#               transposition table in multiprocessing.shared_memory. Helpers
+#               fill the table with results the main search then reads
+#               instead of searching again.
+
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import queue
+import time
+
+from search import Searcher, MAX_DEPTH
+from transposition import TranspositionTable
+
+HELPER_TIMEOUT = 30 #seconds to wait for the helpers' results after stopping them
+HELPER_POLL = 0.1   #seconds between checks for helpers that exited without a result
+
+
+def _helper(game_class, packed, name, index, depth, time_limit, stop_event, results):
+    """
+    Helper process entry point. Take game class, packed root position,
+    shared memory name, helper index, depth, time limit, shared stop event
+    and result queue. Search until done or stopped, then put the search
+    result (or None on error) on the queue.
+    """
+    result = memory = table = None
+    try:
+        memory = shared_memory.SharedMemory(name)
+        table = TranspositionTable(buffer=memory.buf, lockless=True)
+        game = game_class.from_packed(packed)
+        searcher = Searcher(game, table, stop_event=stop_event, seed=index)
+        result = searcher.search(depth, time_limit)
+    finally:
+        results.put(result)
+        if table is not None:
+            table.close()
+        if memory is not None:
+            memory.close()
+
+
+class ParallelSearcher:
+    """
+    Represent a Lazy SMP search over one JanggiGame. Take the game, number
+    of processes (default: all cores, the main process included) and shared
+    table size in MB. A fresh shared table is created for each search and
+    freed when it returns.
+    """
+
+    def __init__(self, game, workers=None, size_mb=16):
+        """
+        Initialize with private data members _game, _workers, _size_mb and
+        the shared _stop event.
+        """
+        self._game = game
+        self._workers = workers if workers is not None else (os.cpu_count() or 1)
+        self._size_mb = size_mb
+        self._stop = multiprocessing.Event()
+
+    def get_workers(self):
+        """
+        Return the number of processes used per search.
+        """
+        return self._workers
+
+    def stop(self):
+        """
+        Ask a running search and its helpers to stop. Safe to call from
+        another thread.
+        """
+        self._stop.set()
+
+    def _helper_results(self, results, helpers):
+        """
+        Take result queue and helper processes, yield each helper's result
+        as it arrives. Stop waiting once every helper has exited, so helpers
+        that die without reporting are skipped, or after HELPER_TIMEOUT
+        seconds.
+        """
+        deadline = time.monotonic() + HELPER_TIMEOUT
+        pending = len(helpers)
+        while pending:
+            try:
+                helper_result = results.get(timeout=HELPER_POLL)
+            except queue.Empty:
+                if time.monotonic() > deadline or not any(helper.is_alive() for helper in helpers):
+                    return #the rest never report
+                continue
+            pending -= 1
+            yield helper_result
+
+    def search(self, depth=None, time_limit=None, info=None):
+        """
+        Take maximum depth and/or time limit and optional info callback for
+        the main search (see Searcher.search()). Return the result of the
+        deepest completed search, main process first on ties, with 'nodes'
+        and 'nps' summed over every process and the number of 'workers'.
+        """
+        target = depth if depth is not None else (MAX_DEPTH if time_limit is not None else 4)
+        self._stop.clear()
+        memory = shared_memory.SharedMemory(create=True,
+                                            size=int(self._size_mb * 1024 * 1024))
+        try:
+            results = multiprocessing.Queue()
+            packed = self._game.to_packed()
+            helpers = []
+            for index in range(1, self._workers):
+                helper_depth = min(MAX_DEPTH, target + index % 2)
+                helper = multiprocessing.Process(
+                    target=_helper, daemon=True,
+                    args=(type(self._game), packed, memory.name, index, helper_depth,
+                          time_limit, self._stop, results))
+                helper.start()
+                helpers.append(helper)
+
+            table = TranspositionTable(buffer=memory.buf, lockless=True)
+            try:
+                result = Searcher(self._game, table, stop_event=self._stop).search(
+                    target, time_limit, info)
+            finally:
+                self._stop.set() #main search decides; stop the helpers
+                table.close()
+
+            best = result
+            nodes = result['nodes']
+            for helper_result in self._helper_results(results, helpers):
+                if helper_result is None:
+                    continue
+                nodes += helper_result['nodes']
+                if helper_result['depth'] > best['depth'] and helper_result['move'] is not None:
+                    best = helper_result
+            for helper in helpers:
+                helper.join(HELPER_POLL)
+                if helper.is_alive():
+                    helper.terminate()
+        finally:
+            memory.close()
+            memory.unlink()
+
+        best = dict(best)
+        best['nodes'] = nodes
+        best['time'] = result['time']
+        best['nps'] = int(nodes / result['time']) if result['time'] > 0 else 0
+        best['workers'] = self._workers
+        return best
@@ -0,0 +1,192 @@
+# Description:  Load-test client for server.py. Opens many concurrent
+#               connections, each playing scripted games (the stored 'late'
+#               test position's moves, with state and board requests mixed
+#               in) with up to --window requests pipelined, then reports
+#               throughput, client-side latency percentiles and the server's
+#               own per-command percentiles. Without --port an in-process
+#               server is started on a free port.
+#
+#               Usage: python load_test.py [--port P] [--clients N]
+#                                          [--games N] [--window N]
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+
+from perft import POSITIONS
+from server import GameServer
+from stats import percentiles
+
+SCRIPT = [move.split('-') for move in POSITIONS['late'].split()]
+
+
+class Connection:
+    """
+    Represent one pipelined client connection. Take host, port and the
+    number of requests allowed in flight.
+    """
+
+    def __init__(self, host, port, window=16):
+        """
+        Initialize with private data members _host, _port, _window,
+        _futures, _ids, _latencies and the stream objects.
+        """
+        self._host = host
+        self._port = port
+        self._window = asyncio.Semaphore(window)
+        self._futures = {}
+        self._ids = itertools.count(1)
+        self._latencies = []
+        self._reader = None
+        self._writer = None
+        self._reading = None
+
+    def get_latencies(self):
+        """
+        Return list of request latencies in seconds.
+        """
+        return self._latencies
+
+    async def open(self):
+        """
+        Connect and start reading responses.
+        """
+        self._reader, self._writer = await asyncio.open_connection(self._host, self._port)
+        self._reading = asyncio.ensure_future(self._read_responses())
+
+    async def close(self):
+        """
+        Close the connection.
+        """
+        self._writer.close()
+        await self._writer.wait_closed()
+        await self._reading
+
+    async def _read_responses(self):
+        """
+        Resolve each request's future as its response line arrives.
+        """
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self._futures.pop(response['id'], None)
+            if future is not None:
+                future.set_result(response)
+        for future in self._futures.values():
+            future.set_exception(ConnectionError("connection closed"))
+
+    async def request(self, **fields):
+        """
+        Take request fields, send the request and return the response dict.
+        Raise RuntimeError if the server reports an error.
+        """
+        async with self._window:
+            request_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            self._futures[request_id] = future
+            started = time.perf_counter()
+            self._writer.write((json.dumps(dict(fields, id=request_id)) + '\n').encode())
+            await self._writer.drain()
+            response = await future
+            self._latencies.append(time.perf_counter() - started)
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response
+
+
+async def play_games(connection, games):
+    """
+    Take open Connection and number of games, play the scripted game that
+    many times with every request pipelined, return the number of requests.
+    """
+    count = 0
+    for _ in range(games):
+        game = (await connection.request(cmd='new'))['game']
+        requests = []
+        for index, (origin, destination) in enumerate(SCRIPT):
+            requests.append(connection.request(cmd='move', game=game, origin=origin,
+                                               destination=destination))
+            if index % 10 == 9:
+                requests.append(connection.request(cmd='state', game=game))
+                requests.append(connection.request(cmd='board', game=game))
+        responses = await asyncio.gather(*requests)
+        if not all(response.get('legal', True) for response in responses):
+            raise RuntimeError("scripted move rejected by the server")
+        await connection.request(cmd='close', game=game)
+        count += len(requests) + 2
+    return count
+
+
+async def load_test(host, port, clients=50, games=4, window=16):
+    """
+    Take server address, number of concurrent clients, games per client and
+    pipeline window, run the load test and return dict with 'requests',
+    'time', 'requests_per_sec', client 'latency_ms' percentiles and the
+    server's 'server_stats'.
+    """
+    connections = [Connection(host, port, window) for _ in range(clients)]
+    await asyncio.gather(*(connection.open() for connection in connections))
+    start = time.perf_counter()
+    counts = await asyncio.gather(*(play_games(connection, games) for connection in connections))
+    elapsed = time.perf_counter() - start
+    server_stats = (await connections[0].request(cmd='stats'))
+    await asyncio.gather(*(connection.close() for connection in connections))
+
+    latencies = [latency for connection in connections for latency in connection.get_latencies()]
+    return {
+        'requests': sum(counts),
+        'time': elapsed,
+        'requests_per_sec': int(sum(counts) / elapsed) if elapsed > 0 else 0,
+        'latency_ms': {name: round(value * 1000, 3)
+                       for name, value in percentiles(latencies).items()},
+        'server_stats': server_stats['commands'],
+    }
+
+
+async def _run(args):
+    """
+    Take parsed arguments, run the load test (against an in-process server
+    if no port was given) and print the report.
+    """
+    server = None
+    host, port = args.host, args.port
+    if port is None:
+        server = GameServer(workers=1)
+        host, port = await server.start(host, 0)
+    try:
+        report = await load_test(host, port, args.clients, args.games, args.window)
+    finally:
+        if server is not None:
+            await server.close()
+    print("%d requests in %.2fs, %d requests/sec" % (
+        report['requests'], report['time'], report['requests_per_sec']))
+    print("client latency ms: " + ", ".join("%s %.3f" % item for item in report['latency_ms'].items()))
+    for command, stats in sorted(report['server_stats'].items()):
+        print("server %-8s count %6d  " % (command, stats['count']) +
+              ", ".join("%s %.3f" % (name, value) for name, value in stats.items()
+                        if name != 'count' and value is not None))
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Load-test the JanggiGame server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None,
+                        help="server port (default: start a local server)")
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--games', type=int, default=4, help="games per client")
+    parser.add_argument('--window', type=int, default=16, help="requests in flight per client")
+    args = parser.parse_args(argv)
+    asyncio.run(_run(args))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# Description:  Mate-detection latency benchmark. Builds a corpus of checking
+#               positions (side to move in check) from seeded random games,
+#               or reads one from a file of FEN lines, and times
+#               has_any_legal_move() with its early exit against generating
+#               and testing every move. Reports positions, mates found and
+#               latency percentiles in microseconds for both.
+#
+#               Usage: python mate_bench.py [--games N] [--seed N]
+#                                           [--corpus FILE] [--write FILE]
+
+import argparse
+import random
+import sys
+import time
+
+from JanggiGame import JanggiGame
+from stats import percentiles
+
+
+def collect_checks(games=200, seed=0, max_plies=200):
+    """
+    Take number of games, seed and ply limit, play random legal moves and
+    return list of FEN strings of every position where the side to move is
+    in check, mates included.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(games):
+        game = JanggiGame()
+        for _ in range(max_plies):
+            if game.is_in_check(game.get_player_turn()):
+                corpus.append(game.to_fen())
+            moves = game.all_legal_moves()
+            if not moves:
+                break
+            game.make_move(*rng.choice(moves))
+    return corpus
+
+
+def read_corpus(path):
+    """
+    Take path of a file with one FEN per line, return list of the FENs.
+    Blank lines and lines starting with '#' are skipped.
+    """
+    with open(path) as handle:
+        return [line.strip() for line in handle
+                if line.strip() and not line.startswith('#')]
+
+
+def _count_legal(game, side):
+    """
+    Take game and side, return the number of legal moves found by testing
+    every pseudo-legal move (the cost without early exit).
+    """
+    count = 0
+    for origin, destination in game.generate_moves(side):
+        game.push_move(origin, destination)
+        if not game.is_general_attacked(side):
+            count += 1
+        game.pop_move()
+    return count
+
+
+def run(corpus, repeat=5):
+    """
+    Take list of FENs and number of timing repeats per position, return dict
+    with 'positions', 'mates' and, for 'early_exit' and 'full', latency
+    percentiles in microseconds. Raise ValueError if the two methods
+    disagree on a position.
+    """
+    timings = {'early_exit': [], 'full': []}
+    mates = 0
+    for fen in corpus:
+        game = JanggiGame.from_fen(fen)
+        side = game.get_player_turn()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            found = game.has_any_legal_move(side)
+        timings['early_exit'].append((time.perf_counter() - start) / repeat)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            count = _count_legal(game, side)
+        timings['full'].append((time.perf_counter() - start) / repeat)
+        if found != (count > 0):
+            raise ValueError("mate detection disagrees on " + fen)
+        mates += not found
+    report = {'positions': len(corpus), 'mates': mates}
+    for name, samples in timings.items():
+        report[name] = {point: round(value * 1e6, 1)
+                        for point, value in percentiles(samples).items()}
+    return report
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark JanggiGame mate detection.")
+    parser.add_argument('--games', type=int, default=200, help="random games to collect checks from")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus', help="file of FEN lines to use instead of random games")
+    parser.add_argument('--write', help="save the corpus as FEN lines to this file")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    corpus = read_corpus(args.corpus) if args.corpus else collect_checks(args.games, args.seed)
+    if args.write:
+        with open(args.write, 'w') as handle:
+            handle.writelines(fen + '\n' for fen in corpus)
+    report = run(corpus, args.repeat)
+    print("%d checking positions, %d mates" % (report['positions'], report['mates']))
+    for name in ('early_exit', 'full'):
+        print("%-10s us: " % name + ", ".join("%s %.1f" % item for item in report[name].items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
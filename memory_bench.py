@@ -0,0 +1,57 @@
+# Description:  Memory benchmark for live JanggiGame objects. Creates a batch
+#               of games, plays the same opening moves in each so boards,
+#               undo stacks and move caches are in use, and reports the bytes
+#               allocated per live game as measured by tracemalloc.
+#
+#               Usage: python memory_bench.py [--games N] [--moves N]
+
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from JanggiGame import JanggiGame
+from perft import POSITIONS
+
+SCRIPT = [move.split('-') for move in POSITIONS['late'].split()]
+
+
+def bytes_per_game(games=1000, moves=20):
+    """
+    Take number of games and number of scripted moves to play in each,
+    return the average number of bytes allocated per live game.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        live = []
+        for _ in range(games):
+            game = JanggiGame()
+            for origin, destination in SCRIPT[:moves]:
+                game.make_move(origin, destination)
+            live.append(game)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before) / games
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Bytes per live JanggiGame.")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--moves', type=int, default=20,
+                        help="scripted moves played in each game (max %d)" % len(SCRIPT))
+    args = parser.parse_args(argv)
+    for moves in sorted({0, args.moves}):
+        print("%d games, %2d moves each: %8.0f bytes per game" % (
+            args.games, moves, bytes_per_game(args.games, moves)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# Description:  Bounded least-recently-used cache for move lists. Pieces are
+#               shared flyweights and carry no per-game state, so the move
+#               lists JanggiGame computes are kept here instead, keyed by
+#               position hash (plus square or side to move), and shared by
+#               every game in the process. A move changes the hash, so
+#               entries never go stale; old positions simply age out.
+
+import collections
+
+MOVE_CACHE_SIZE = 4096 #entries kept before the least recently used is dropped
+
+
+class MoveCache:
+    """
+    Represent a bounded LRU cache with hit, miss and eviction counters. Take
+    the maximum number of entries.
+    """
+
+    def __init__(self, size=MOVE_CACHE_SIZE):
+        """
+        Initialize with private data members _size, _entries, _hits, _misses
+        and _evictions.
+        """
+        if size < 1:
+            raise ValueError("cache size must be at least 1")
+        self._size = size
+        self._entries = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        """
+        Return the number of cached entries.
+        """
+        return len(self._entries)
+
+    def get_size(self):
+        """
+        Return the maximum number of entries.
+        """
+        return self._size
+
+    def get(self, key):
+        """
+        Take key, return its cached value (marking it recently used) or None.
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Take key and value, cache the value, dropping the least recently used
+        entry if the cache is full.
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters.
+        """
+        self._entries.clear()
+        self._hits = self._misses = self._evictions = 0
+
+    def get_stats(self):
+        """
+        Return dict of size, entries, hits, misses, evictions and hit rate.
+        """
+        lookups = self._hits + self._misses
+        return {
+            'size': self._size,
+            'entries': len(self._entries),
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+            'hit_rate': self._hits / lookups if lookups else 0.0,
+        }
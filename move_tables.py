@@ -0,0 +1,236 @@
+# Description:  Board geometry and move tables for the game of Janggi. All
+#               tables are built once at import time and indexed by board
+#               square (0-89, index = row * 9 + col, a1 = 0, i10 = 89), so
+#               piece rules become lookups instead of arithmetic on strings.
+
+COLUMNS = 'abcdefghi'
+SQUARE_NAMES = tuple(col + str(row + 1) for row in range(10) for col in COLUMNS)
+SQUARE_INDEX = {name: index for index, name in enumerate(SQUARE_NAMES)}
+
+RED_PALACE = frozenset({3, 4, 5, 12, 13, 14, 21, 22, 23})      #d1-f3
+BLUE_PALACE = frozenset({66, 67, 68, 75, 76, 77, 84, 85, 86})  #d8-f10
+PALACES = {'RED': RED_PALACE, 'BLUE': BLUE_PALACE}
+
+#Squares joined by the diagonal lines of each palace, corners through center
+PALACE_DIAGONALS = (frozenset({3, 13, 23}), frozenset({5, 13, 21}),
+                    frozenset({66, 76, 86}), frozenset({68, 76, 84}))
+
+
+def square_index(name):
+    """
+    Take square in algebraic notation (e.g., 'a10'), return its board index.
+    """
+    return SQUARE_INDEX[name]
+
+
+def square_name(index):
+    """
+    Take board index (0-89), return the square in algebraic notation.
+    """
+    return SQUARE_NAMES[index]
+
+
+def _on_board(row, col):
+    """
+    Take row and column, return True if they are on the board.
+    """
+    return 0 <= row < 10 and 0 <= col < 9
+
+
+def _sign(value):
+    """
+    Take integer, return -1, 0 or 1.
+    """
+    return (value > 0) - (value < 0)
+
+
+def _build_palace_diagonal_rays():
+    """
+    Return per-square tuple of rays (tuples of squares, nearest first) that
+    run along palace diagonal lines.
+    """
+    rays = [[] for _ in range(90)]
+    for line in PALACE_DIAGONALS:
+        ordered = sorted(line)
+        for i, square in enumerate(ordered):
+            if i < len(ordered) - 1:
+                rays[square].append(tuple(ordered[i + 1:]))
+            if i > 0:
+                rays[square].append(tuple(reversed(ordered[:i])))
+    return tuple(tuple(ray_list) for ray_list in rays)
+
+
+def _build_orthogonal_rays():
+    """
+    Return per-square tuple of the four orthogonal rays (up, down, right,
+    left), each a tuple of squares ordered nearest first.
+    """
+    rays = []
+    for square in range(90):
+        row, col = divmod(square, 9)
+        square_rays = []
+        for d_row, d_col in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            ray = []
+            r, c = row + d_row, col + d_col
+            while _on_board(r, c):
+                ray.append(r * 9 + c)
+                r, c = r + d_row, c + d_col
+            if ray:
+                square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+def _build_horse_moves():
+    """
+    Return per-square tuple of (target, leg) pairs for the horse. The leg is
+    the orthogonally adjacent square that blocks the move when occupied.
+    """
+    moves = []
+    for square in range(90):
+        row, col = divmod(square, 9)
+        square_moves = []
+        for d_row, d_col in ((2, 1), (2, -1), (-2, 1), (-2, -1),
+                             (1, 2), (-1, 2), (1, -2), (-1, -2)):
+            if not _on_board(row + d_row, col + d_col):
+                continue
+            if abs(d_row) == 2:
+                leg = (row + _sign(d_row)) * 9 + col
+            else:
+                leg = row * 9 + col + _sign(d_col)
+            square_moves.append(((row + d_row) * 9 + col + d_col, leg))
+        moves.append(tuple(square_moves))
+    return tuple(moves)
+
+
+def _build_elephant_moves():
+    """
+    Return per-square tuple of (target, first leg, second leg) for the
+    elephant: one step orthogonally then two steps diagonally outward.
+    """
+    moves = []
+    for square in range(90):
+        row, col = divmod(square, 9)
+        square_moves = []
+        for d_row, d_col in ((3, 2), (3, -2), (-3, 2), (-3, -2),
+                             (2, 3), (-2, 3), (2, -3), (-2, -3)):
+            if not _on_board(row + d_row, col + d_col):
+                continue
+            if abs(d_row) == 3:
+                first_row, first_col = row + _sign(d_row), col
+            else:
+                first_row, first_col = row, col + _sign(d_col)
+            first_leg = first_row * 9 + first_col
+            second_leg = (first_row + _sign(d_row)) * 9 + first_col + _sign(d_col)
+            square_moves.append(((row + d_row) * 9 + col + d_col, first_leg, second_leg))
+        moves.append(tuple(square_moves))
+    return tuple(moves)
+
+
+def _build_palace_moves(palace):
+    """
+    Take palace, return per-square tuple of one-step targets for the general
+    and guards: orthogonal neighbours in the palace plus diagonal neighbours
+    along palace lines. Squares outside the palace have no targets.
+    """
+    moves = []
+    for square in range(90):
+        targets = []
+        if square in palace:
+            row, col = divmod(square, 9)
+            for d_row, d_col in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                target = (row + d_row) * 9 + col + d_col
+                if _on_board(row + d_row, col + d_col) and target in palace:
+                    targets.append(target)
+            for ray in PALACE_DIAGONAL_RAYS[square]:
+                targets.append(ray[0])
+        moves.append(tuple(targets))
+    return tuple(moves)
+
+
+def _build_soldier_moves(forward, enemy_palace):
+    """
+    Take forward row step and the enemy palace, return per-square tuple of
+    soldier targets: one step forward or sideways, or one step diagonally
+    forward along the lines of the enemy palace.
+    """
+    moves = []
+    for square in range(90):
+        row, col = divmod(square, 9)
+        targets = []
+        for d_row, d_col in ((forward, 0), (0, -1), (0, 1)):
+            if _on_board(row + d_row, col + d_col):
+                targets.append((row + d_row) * 9 + col + d_col)
+        if square in enemy_palace:
+            for ray in PALACE_DIAGONAL_RAYS[square]:
+                if ray[0] // 9 - row == forward:
+                    targets.append(ray[0])
+        moves.append(tuple(targets))
+    return tuple(moves)
+
+
+def _invert(moves):
+    """
+    Take per-square tuple of move entries (target, leg, ...), return
+    per-square tuple of (origin, leg, ...) entries for every move that lands
+    on that square.
+    """
+    attacks = [[] for _ in range(90)]
+    for origin in range(90):
+        for entry in moves[origin]:
+            attacks[entry[0]].append((origin,) + entry[1:])
+    return tuple(tuple(entries) for entries in attacks)
+
+
+def _invert_targets(targets):
+    """
+    Take per-square tuple of target squares, return per-square tuple of the
+    origins that have that square as a target.
+    """
+    origins = [[] for _ in range(90)]
+    for origin in range(90):
+        for target in targets[origin]:
+            origins[target].append(origin)
+    return tuple(tuple(square_origins) for square_origins in origins)
+
+
+def _build_lines_between():
+    """
+    Return per-square dict mapping every square reachable along a straight
+    line (orthogonal or palace diagonal) to the tuple of squares strictly
+    between the two.
+    """
+    lines = []
+    for square in range(90):
+        between = {}
+        for ray in ORTHOGONAL_RAYS[square] + PALACE_DIAGONAL_RAYS[square]:
+            for i, target in enumerate(ray):
+                between[target] = ray[:i]
+        lines.append(between)
+    return tuple(lines)
+
+
+PALACE_DIAGONAL_RAYS = _build_palace_diagonal_rays()
+PALACE_ADJACENT = tuple(tuple(ray[0] for ray in rays) for rays in PALACE_DIAGONAL_RAYS)
+ORTHOGONAL_RAYS = _build_orthogonal_rays()
+LINE_RAYS = tuple(ORTHOGONAL_RAYS[square] + PALACE_DIAGONAL_RAYS[square] for square in range(90))
+LINES_BETWEEN = _build_lines_between()
+
+HORSE_MOVES = _build_horse_moves()
+HORSE_LEGS = tuple(dict(moves) for moves in HORSE_MOVES)
+ELEPHANT_MOVES = _build_elephant_moves()
+ELEPHANT_LEGS = tuple({target: (first, second) for target, first, second in moves}
+                      for moves in ELEPHANT_MOVES)
+
+PALACE_MOVES = {'RED': _build_palace_moves(RED_PALACE),
+                'BLUE': _build_palace_moves(BLUE_PALACE)}
+SOLDIER_MOVES = {'RED': _build_soldier_moves(1, BLUE_PALACE),   #RED advances up the rows
+                 'BLUE': _build_soldier_moves(-1, RED_PALACE)}
+
+#Reverse tables for attack detection: for each target square, the origins
+#...that reach it and the legs that must be empty. Palace moves and line rays
+#...are symmetric, so PALACE_MOVES and LINE_RAYS serve in both directions.
+HORSE_ATTACKS = _invert(HORSE_MOVES)
+ELEPHANT_ATTACKS = _invert(ELEPHANT_MOVES)
+SOLDIER_ATTACKS = {'RED': _invert_targets(SOLDIER_MOVES['RED']),
+                   'BLUE': _invert_targets(SOLDIER_MOVES['BLUE'])}
@@ -0,0 +1,142 @@
+# Description:  Compact position notation for JanggiGame: a FEN-style text
+#               form and a fixed-size packed binary form (90 squares at 4
+#               bits each plus one flag byte). Both work on the 90-byte piece
+#               code array (see JanggiGame.get_piece_codes()), so positions
+#               are stored and read without Python piece objects.
+#
+#               FEN: ranks from row 10 down to row 1 separated by '/', digits
+#               for runs of empty squares, BLUE pieces uppercase and RED
+#               lowercase (K general, A guard, N horse, B elephant, R chariot,
+#               C cannon, P soldier), then side to move ('b'/'r'), side in
+#               check ('b'/'r'/'-') and winner ('b'/'r'/'-'). The check and
+#               winner fields may be left out; they are then UNKNOWN.
+
+FEN_LETTERS = 'kanbrcp' #by piece kind: General, Guard, Horse, Elephant, Chariot, Cannon, Soldier
+INITIAL_FEN = 'RBNA1ABNR/4K4/1C5C1/P1P1P1P1P/9/9/p1p1p1p1p/1c5c1/4k4/rbna1abnr b - -'
+PACKED_SIZE = 46 #45 bytes of squares + 1 flag byte
+UNKNOWN = '?' #check or winner left out of a FEN, to be worked out from the board
+
+_SIDE_LETTERS = {None: '-', 'RED': 'r', 'BLUE': 'b'}
+_LETTER_SIDES = {letter: side for side, letter in _SIDE_LETTERS.items()}
+_STATE_SIDES = {'UNFINISHED': None, 'RED_WON': 'RED', 'BLUE_WON': 'BLUE'}
+_SIDE_STATES = {side: state for state, side in _STATE_SIDES.items()}
+_FLAG_SIDES = (None, 'RED', 'BLUE')
+
+
+def _code_letter(code):
+    """
+    Take piece code 1-14, return its FEN letter.
+    """
+    if code <= 7:
+        return FEN_LETTERS[code - 1]
+    return FEN_LETTERS[code - 8].upper()
+
+
+def _letter_code(letter):
+    """
+    Take FEN piece letter, return its piece code, raising ValueError if it
+    is not a piece letter.
+    """
+    kind = FEN_LETTERS.find(letter.lower())
+    if kind == -1:
+        raise ValueError("unknown piece letter %r" % letter)
+    if letter.islower():
+        return 1 + kind
+    return 8 + kind
+
+
+def to_fen(codes, player_turn, in_check, game_state):
+    """
+    Take 90 piece codes, side to move, side in check (or None) and game
+    state, return the position as a FEN string.
+    """
+    ranks = []
+    for row in range(9, -1, -1):
+        rank = ''
+        empty = 0
+        for square in range(row * 9, row * 9 + 9):
+            code = codes[square]
+            if code == 0:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            rank += _code_letter(code)
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+    return ' '.join(['/'.join(ranks), _SIDE_LETTERS[player_turn],
+                     _SIDE_LETTERS[in_check], _SIDE_LETTERS[_STATE_SIDES[game_state]]])
+
+
+def from_fen(text):
+    """
+    Take FEN string, return (codes, player_turn, in_check, game_state) with
+    codes as bytes of 90 piece codes. Missing check and winner fields are
+    returned as UNKNOWN. Raise ValueError if the string is malformed.
+    """
+    fields = text.split()
+    if not 2 <= len(fields) <= 4:
+        raise ValueError("FEN needs 2 to 4 fields: %r" % text)
+    ranks = fields[0].split('/')
+    if len(ranks) != 10:
+        raise ValueError("FEN needs 10 ranks: %r" % fields[0])
+
+    codes = bytearray(90)
+    for rank_index, rank in enumerate(ranks):
+        row = 9 - rank_index
+        col = 0
+        for letter in rank:
+            if letter.isdigit():
+                col += int(letter)
+            else:
+                if col > 8:
+                    raise ValueError("rank too long: %r" % rank)
+                codes[row * 9 + col] = _letter_code(letter)
+                col += 1
+        if col != 9:
+            raise ValueError("rank must cover 9 squares: %r" % rank)
+
+    if fields[1] not in ('r', 'b') or any(field not in _LETTER_SIDES for field in fields[2:]):
+        raise ValueError("bad side, check or winner field: %r" % text)
+    in_check = _LETTER_SIDES[fields[2]] if len(fields) > 2 else UNKNOWN
+    game_state = _SIDE_STATES[_LETTER_SIDES[fields[3]]] if len(fields) > 3 else UNKNOWN
+    return bytes(codes), _LETTER_SIDES[fields[1]], in_check, game_state
+
+
+def pack(codes, player_turn, in_check, game_state):
+    """
+    Take 90 piece codes, side to move, side in check (or None) and game
+    state, return PACKED_SIZE bytes: two squares per byte (even square in
+    the low nibble), then a flag byte with the side to move in bit 0, side
+    in check in bits 1-2 and winner in bits 3-4.
+    """
+    packed = bytearray(PACKED_SIZE)
+    for i in range(45):
+        packed[i] = codes[2 * i] | (codes[2 * i + 1] << 4)
+    packed[45] = ((player_turn == 'RED') |
+                  (_FLAG_SIDES.index(in_check) << 1) |
+                  (_FLAG_SIDES.index(_STATE_SIDES[game_state]) << 3))
+    return bytes(packed)
+
+
+def unpack(data):
+    """
+    Take PACKED_SIZE bytes from pack(), return (codes, player_turn,
+    in_check, game_state) with codes as bytes of 90 piece codes. Raise
+    ValueError if the data has the wrong size or bad flags.
+    """
+    if len(data) != PACKED_SIZE:
+        raise ValueError("packed position must be %d bytes" % PACKED_SIZE)
+    codes = bytearray(90)
+    for i in range(45):
+        codes[2 * i] = data[i] & 0x0F
+        codes[2 * i + 1] = data[i] >> 4
+    flags = data[45]
+    check_flag = (flags >> 1) & 3
+    state_flag = (flags >> 3) & 3
+    if check_flag == 3 or state_flag == 3 or max(codes) > 14:
+        raise ValueError("corrupt packed position")
+    return (bytes(codes), 'RED' if flags & 1 else 'BLUE', _FLAG_SIDES[check_flag],
+            _SIDE_STATES[_FLAG_SIDES[state_flag]])
@@ -0,0 +1,236 @@
+# Description:  Opening book keyed by the Zobrist position hash. A builder
+#               replays game records and compiles per-position move
+#               statistics into a file of fixed-size entries sorted by
+#               (hash, move). The reader memory-maps that file and binary
+#               searches it, so lookups never load the book into the heap and
+#               any number of processes share the same mapped pages.
+#
+#               File layout: HEADER (magic, version, entry size, entry count)
+#               followed by ENTRY records, all little-endian.
+#
+#               Usage: python opening_book.py RECORDS BOOK [--plies N]
+#                                             [--min-games N]
+
+import argparse
+import collections
+import mmap
+import random
+import struct
+import sys
+
+from JanggiGame import JanggiGame
+from move_tables import SQUARE_INDEX, SQUARE_NAMES
+import game_record
+
+MAGIC = b'JGBK'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQ')  #magic, version, entry size, entry count
+ENTRY = struct.Struct('<QHII')    #position hash, move, games, wins for the mover
+
+BookMove = collections.namedtuple('BookMove', ['origin', 'destination', 'games', 'wins'])
+BookMove.__doc__ = """
+One book move in algebraic notation, with the number of recorded games it
+was played in and how many of them the side that played it went on to win.
+"""
+
+_WINNERS = {'RED_WON': 'RED', 'BLUE_WON': 'BLUE'}
+
+
+def _pack_move(origin, destination):
+    """
+    Take origin and destination board indices, return the 16-bit book move.
+    """
+    return origin * 90 + destination
+
+
+def collect_statistics(records, plies=20):
+    """
+    Take iterable of GameRecord objects and number of plies to record per
+    game, return dict mapping (position hash, move) to [games, wins]. Each
+    game is replayed through JanggiGame (from its FEN header if it has one)
+    and stops at its first illegal move.
+    """
+    stats = {}
+    for record in records:
+        fen = record.headers.get('FEN')
+        game = JanggiGame() if fen is None else JanggiGame.from_fen(fen)
+        winner = _WINNERS.get(record.result)
+        for origin, destination in record.moves[:plies]:
+            key = game.position_hash()
+            mover = game.get_player_turn()
+            if not game.make_move(origin, destination):
+                break
+            move = _pack_move(SQUARE_INDEX[origin], SQUARE_INDEX[destination])
+            entry = stats.setdefault((key, move), [0, 0])
+            entry[0] += 1
+            if winner == mover:
+                entry[1] += 1
+    return stats
+
+
+def write_book(stats, path, min_games=1):
+    """
+    Take statistics from collect_statistics(), output path and minimum games
+    per move, write the sorted book file and return the number of entries.
+    """
+    keys = sorted(key for key, (games, wins) in stats.items() if games >= min_games)
+    with open(path, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, VERSION, ENTRY.size, len(keys)))
+        for key, move in keys:
+            games, wins = stats[key, move]
+            handle.write(ENTRY.pack(key, move, min(games, 0xFFFFFFFF), min(wins, 0xFFFFFFFF)))
+    return len(keys)
+
+
+def build_book(records, path, plies=20, min_games=1):
+    """
+    Take iterable of GameRecord objects, output path, plies per game and
+    minimum games per move, build the book file and return its entry count.
+    """
+    return write_book(collect_statistics(records, plies), path, min_games)
+
+
+class OpeningBook:
+    """
+    Represent a read-only, memory-mapped opening book file. Take the path of
+    a file written by build_book(). Picklable: a copy sent to a worker
+    process reopens and maps the same file.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the mapping and check the file header. Raise ValueError
+        if the file is not an opening book.
+        """
+        self._path = path
+        with open(path, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            self._map.close()
+            raise ValueError("%s: not an opening book" % path)
+        magic, version, entry_size, count = HEADER.unpack_from(self._map, 0)
+        if (magic != MAGIC or version != VERSION or entry_size != ENTRY.size or
+                len(self._map) != HEADER.size + count * ENTRY.size):
+            self._map.close()
+            raise ValueError("%s: not an opening book" % path)
+        self._count = count
+
+    def __reduce__(self):
+        """
+        Pickle as the path, so each process maps the file itself.
+        """
+        return (OpeningBook, (self._path,))
+
+    def __enter__(self):
+        """
+        Return the book, for use in a with statement.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Unmap the file at the end of a with statement.
+        """
+        self.close()
+
+    def __len__(self):
+        """
+        Return the number of (position, move) entries.
+        """
+        return self._count
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        self._map.close()
+
+    def get_path(self):
+        """
+        Return the path of the book file.
+        """
+        return self._path
+
+    def _key_at(self, index):
+        """
+        Take entry index, return the position hash stored there.
+        """
+        return struct.unpack_from('<Q', self._map, HEADER.size + index * ENTRY.size)[0]
+
+    def lookup(self, key):
+        """
+        Take position hash, return list of (move, games, wins) entries for
+        it, with move as (origin, destination) board indices.
+        """
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        offset = HEADER.size + low * ENTRY.size
+        end = HEADER.size + self._count * ENTRY.size
+        while offset < end:
+            entry_key, move, games, wins = ENTRY.unpack_from(self._map, offset)
+            if entry_key != key:
+                break
+            entries.append((divmod(move, 90), games, wins))
+            offset += ENTRY.size
+        return entries
+
+    def book_moves(self, game):
+        """
+        Take JanggiGame, return list of BookMove tuples for its current
+        position, most played first. Moves whose origin does not hold a
+        piece of the side to move (a hash collision) are left out.
+        """
+        side = game.get_player_turn()
+        board = game.get_board()
+        moves = []
+        for (origin, destination), games, wins in self.lookup(game.position_hash()):
+            piece = board[origin]
+            if piece != 0 and piece.get_side() == side:
+                moves.append(BookMove(SQUARE_NAMES[origin], SQUARE_NAMES[destination], games, wins))
+        moves.sort(key=lambda move: -move.games)
+        return moves
+
+    def choose_move(self, game, rng=None, by_wins=False):
+        """
+        Take JanggiGame, optional random.Random and whether to weight by wins
+        instead of games played, return a randomly chosen (origin,
+        destination) book move weighted by its count, or None if the
+        position is not in the book.
+        """
+        moves = self.book_moves(game)
+        if not moves:
+            return None
+        weights = [move.wins + 1 if by_wins else move.games for move in moves]
+        move = (rng or random).choices(moves, weights)[0]
+        return move.origin, move.destination
+
+
+def main(argv=None):
+    """
+    Command-line entry point. Build a book from a game record file (plain or
+    .gz) and print the book moves of the initial setup.
+    """
+    parser = argparse.ArgumentParser(description="Build a JanggiGame opening book.")
+    parser.add_argument('records', help="game record file (see game_record.py)")
+    parser.add_argument('book', help="output book file")
+    parser.add_argument('--plies', type=int, default=20, help="plies recorded per game")
+    parser.add_argument('--min-games', type=int, default=1, help="drop rarer moves")
+    args = parser.parse_args(argv)
+
+    count = build_book(game_record.read_games(args.records), args.book, args.plies, args.min_games)
+    print("%d entries written to %s" % (count, args.book))
+    with OpeningBook(args.book) as book:
+        for move in book.book_moves(JanggiGame()):
+            print("%s-%s  games %d  wins %d" % move)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+# Description:  Perft node counter for JanggiGame move generation. Counts the
+#               leaf nodes of the legal move tree from the initial setup and
+#               from stored test positions, with per-root-move divide output,
+#               timing in nodes/sec and a table of reference counts to verify
+#               that move-generation changes keep legality intact. --verify
+#               also checks that make_move() accepts exactly the generated
+#               legal moves at every node of a shallow tree, and runs
+#               RULE_CHECKS, single moves pinning down rule decisions.
+#
+#               Usage: python perft.py [--depth N] [--position NAME]
+#                                      [--divide] [--verify]
+
+import argparse
+import sys
+import time
+
+from JanggiGame import JanggiGame, square_name
+
+#Test positions as move lists played from the initial setup, and expected
+#...perft counts for depth 1, 2, 3. Pass moves are not counted.
+POSITIONS = {
+    'initial': '',
+    'opening': 'e9-f8 g4-g5 h8-h2 a4-a5 c10-d8 b1-d4 c7-c6 a1-b1 d10-e10 e4-e5 '
+               'f10-e9 e5-e6 h2-h9 b1-b2 h9-b9 d1-d2',
+    'middlegame': 'h8-h2 i4-i5 a10-a8 a4-b4 e9-e10 e2-d3 f10-f9 a1-a2 g7-h7 a2-b2 '
+                  'f9-e9 b2-a2 h2-h5 b1-d4 b10-d7 d1-e2 c10-d8 g4-f4 c7-b7 b3-b5 '
+                  'd7-b4 e2-d2 d8-c6 a2-b2 e9-e8 c4-b4 c6-a5 b5-b8 i10-i8 c1-b3',
+    'late': 'g7-h7 a1-a3 i10-i9 d1-d2 e7-f7 e2-d1 c7-d7 b1-d4 h8-a8 g4-g5 h7-g7 '
+            'd4-f7 f10-f9 i4-h4 b8-b2 h3-h6 h10-g8 e4-e5 g7-h7 h4-h5 a8-a5 b3-b1 '
+            'a10-a9 i1-i2 d7-d6 h6-h4 h7-h6 a3-i3 b2-g2 h5-h6 f9-f8 d1-e1 a9-c9 '
+            'f1-e2 a5-a3 i2-h2 c9-c5 i3-i2 i9-f9 h6-g6 d6-e6 a4-b4 g2-g6 b1-b5 '
+            'g6-g4 h4-d4 g8-i9 h2-h9 a3-a10 d2-d1',
+}
+
+#Rules this implementation settled beyond the original code (see README,
+#...Rules): (description, FEN, origin, destination, make_move() result)
+RULE_CHECKS = (
+    ("chariot moves along a palace diagonal", '9/4K4/9/9/9/9/9/9/9/3r1k3 r', 'd1', 'e2', True),
+    ("chariot slides corner to corner through the palace", '9/4K4/9/9/9/9/9/9/9/3r1k3 r',
+     'd1', 'f3', True),
+    ("no diagonal step off the palace lines", '9/4K4/9/9/9/9/9/9/3r5/5k3 r', 'd2', 'e3', False),
+    ("cannon jumps the palace center diagonally", '9/4K4/9/9/9/9/9/9/4a4/3c1k3 r',
+     'd1', 'f3', True),
+    ("soldier steps diagonally forward in the enemy palace", '3K5/9/3p5/9/9/9/9/9/4k4/9 r',
+     'd8', 'e9', True),
+    ("soldier has no diagonal step outside the palace", '3K5/9/3p5/9/9/9/9/9/4k4/9 r',
+     'd8', 'c9', False),
+    ("soldier steps forward onto row 10", '4K4/3p5/9/9/9/9/9/9/4k4/9 r', 'd9', 'd10', True),
+    ("soldier does not step back along a palace diagonal", '9/4p4/5K3/9/9/9/9/9/4k4/9 r',
+     'e9', 'd8', False),
+    ("cannon captures along the a-file onto a1", '4K4/9/9/9/9/C8/9/p8/4k4/r8 b',
+     'a5', 'a1', True),
+    ("a side in check may not pass", '3K5/9/9/9/9/4R4/9/9/4k4/9 r', 'e2', 'e2', False),
+    ("a check that can be blocked is not mate", '9/3RKR3/4R4/9/9/r8/9/9/9/3aka3 r',
+     'a5', 'e5', True),
+)
+
+MAKE_MOVE_DEPTH = 2 #--verify checks make_move() at every node to this depth
+
+REFERENCE_COUNTS = {
+    'initial': (37, 1347, 50193),
+    'opening': (45, 1732, 74815),
+    'middlegame': (33, 1129, 38809),
+    'late': (40, 2089, 83338),
+}
+
+
+def load_position(name):
+    """
+    Take name of a stored test position, return a JanggiGame with its moves
+    played from the initial setup.
+    """
+    game = JanggiGame()
+    for move in POSITIONS[name].split():
+        origin, destination = move.split('-')
+        if not game.make_move(origin, destination):
+            raise ValueError("illegal move %s in test position %s" % (move, name))
+    return game
+
+
+def perft(game, depth):
+    """
+    Take game and depth, return the number of leaf nodes of the legal move
+    tree of that depth from the current position.
+    """
+    if depth == 0:
+        return 1
+    side = game.get_player_turn()
+    nodes = 0
+    for origin, destination in game.generate_moves(side):
+        game.push_move(origin, destination)
+        if not game.is_general_attacked(side):
+            nodes += 1 if depth == 1 else perft(game, depth - 1)
+        game.pop_move()
+    return nodes
+
+
+def divide(game, depth):
+    """
+    Take game and depth >= 1, return dict mapping each legal root move (in
+    algebraic notation) to its perft count at depth - 1.
+    """
+    side = game.get_player_turn()
+    counts = {}
+    for origin, destination in game.generate_moves(side):
+        game.push_move(origin, destination)
+        if not game.is_general_attacked(side):
+            counts[square_name(origin) + '-' + square_name(destination)] = perft(game, depth - 1)
+        game.pop_move()
+    return counts
+
+
+def check_make_move(game, depth):
+    """
+    Take game and depth, return list of (position FEN, move, problem) for
+    every node of the legal move tree down to that depth where the moves
+    make_move() accepts (passes aside) differ from the generated legal
+    moves. Every origin and destination pair of the side to move is tried,
+    so the rule checks inside make_move() are covered too.
+    """
+    side = game.get_player_turn()
+    legal = set()
+    for origin, destination in game.generate_moves(side):
+        game.push_move(origin, destination)
+        if not game.is_general_attacked(side):
+            legal.add((origin, destination))
+        game.pop_move()
+    accepted = set()
+    for origin in game.get_piece_squares(side):
+        for destination in range(90):
+            if destination != origin and game.make_move(square_name(origin),
+                                                        square_name(destination)):
+                accepted.add((origin, destination))
+                game.pop_move()
+    problems = []
+    for origin, destination in sorted(legal ^ accepted):
+        problem = 'rejected by make_move' if (origin, destination) in legal else 'not generated'
+        problems.append((game.to_fen(), square_name(origin) + '-' + square_name(destination),
+                         problem))
+    if depth > 1:
+        for origin, destination in sorted(legal):
+            game.push_move(origin, destination)
+            problems.extend(check_make_move(game, depth - 1))
+            game.pop_move()
+    return problems
+
+
+def check_rules():
+    """
+    Return list of the RULE_CHECKS descriptions whose make_move() result
+    differs from the expected one.
+    """
+    failures = []
+    for description, fen, origin, destination, expected in RULE_CHECKS:
+        if JanggiGame.from_fen(fen).make_move(origin, destination) != expected:
+            failures.append(description)
+    return failures
+
+
+def run(name, depth, show_divide=False, out=None):
+    """
+    Take position name and depth, print counts and nodes/sec for every depth
+    up to depth (to out, default stdout). Return True if all counts with a
+    reference value match.
+    """
+    out = out if out is not None else sys.stdout
+    ok = True
+    for current in range(1, depth + 1):
+        game = load_position(name)
+        start = time.perf_counter()
+        if show_divide and current == depth:
+            counts = divide(game, current)
+            for move in sorted(counts):
+                print("  %-8s %d" % (move, counts[move]), file=out)
+            nodes = sum(counts.values())
+        else:
+            nodes = perft(game, current)
+        elapsed = time.perf_counter() - start
+        expected = REFERENCE_COUNTS.get(name, ())
+        status = ''
+        if current <= len(expected):
+            if expected[current - 1] == nodes:
+                status = 'ok'
+            else:
+                status = 'MISMATCH (expected %d)' % expected[current - 1]
+                ok = False
+        nps = int(nodes / elapsed) if elapsed > 0 else 0
+        print("%-10s depth %d  nodes %10d  %8.3fs  %9d nodes/sec  %s"
+              % (name, current, nodes, elapsed, nps, status), file=out)
+    return ok
+
+
+def main(argv=None):
+    """
+    Command-line entry point. Return exit status 0 if all checked counts
+    match the reference table, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Perft node counts for JanggiGame.")
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--position', choices=sorted(POSITIONS), action='append',
+                        help="test position (repeatable, default all)")
+    parser.add_argument('--divide', action='store_true',
+                        help="print per-root-move counts at the final depth")
+    parser.add_argument('--verify', action='store_true',
+                        help="run every position to its deepest reference count and check "
+                             "make_move() against the generator to depth %d" % MAKE_MOVE_DEPTH)
+    args = parser.parse_args(argv)
+
+    ok = True
+    for name in args.position or list(POSITIONS):
+        depth = len(REFERENCE_COUNTS[name]) if args.verify else args.depth
+        ok = run(name, depth, args.divide) and ok
+        if args.verify:
+            start = time.perf_counter()
+            problems = check_make_move(load_position(name), MAKE_MOVE_DEPTH)
+            for fen, move, problem in problems[:10]:
+                print("  %s %s: %s" % (fen, move, problem))
+            print("%-10s make_move agrees with generated moves to depth %d  %8.3fs  %s"
+                  % (name, MAKE_MOVE_DEPTH, time.perf_counter() - start,
+                     'MISMATCH (%d moves)' % len(problems) if problems else 'ok'))
+            ok = ok and not problems
+    if args.verify:
+        failures = check_rules()
+        for description in failures:
+            print("  rule check failed: %s" % description)
+        print("%-10s %d rule checks  %s" % ('rules', len(RULE_CHECKS),
+                                           'FAILED (%d)' % len(failures) if failures else 'ok'))
+        ok = ok and not failures
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,18 @@
 #print_board module
+from JanggiGame import SQUARE_NAMES
 
 def print_board(board):
     """
-    Take board as dict and print the board to terminal window.
+    Take board as list of 90 squares (or dict keyed by algebraic notation) and
+    print the board to terminal window.
     NOTE: Going to need to access the values
     """
+    squares = board
+    if not isinstance(squares, dict):
+        squares = dict(zip(SQUARE_NAMES, board))
     print('\n    a     b     c     d     e     f     g     h     i\n')
     x = 0
-    for key, value in board.items():
+    for key, value in squares.items():
         if x == 0:                      #very first row/col = a1
             if value != 0:
                 print(key[1],"",value.get_token(),end=" - ") #***NOTE this is the thing I changed
@@ -0,0 +1,88 @@
+# Description:  Batch re-validation of recorded games. Move lists are streamed
+#               to a process pool in chunks; each worker replays its games
+#               through JanggiGame.make_move() and sends back only a small
+#               result per game (final state, first illegal move, position
+#               hash), never the board itself.
+
+import collections
+import itertools
+import multiprocessing
+import os
+
+from JanggiGame import JanggiGame
+
+ReplayResult = collections.namedtuple('ReplayResult',
+                                      ['game_state', 'illegal_move', 'position_hash'])
+ReplayResult.__doc__ = """
+Result of replaying one game: final get_game_state(), index of the first
+illegal move (None if every move was legal) and final position_hash().
+Replay stops at the first illegal move.
+"""
+
+
+def replay_game(moves, fen=None):
+    """
+    Take sequence of moves, each an (origin, destination) pair or an
+    'origin-destination' string in algebraic notation, and optionally a FEN
+    start position. Replay them from the initial setup (or the FEN) and
+    return a ReplayResult.
+    """
+    game = JanggiGame() if fen is None else JanggiGame.from_fen(fen)
+    illegal_move = None
+    for index, move in enumerate(moves):
+        if isinstance(move, str):
+            move = move.split('-')
+        if len(move) != 2 or not game.make_move(move[0], move[1]):
+            illegal_move = index
+            break
+    return ReplayResult(game.get_game_state(), illegal_move, game.position_hash())
+
+
+def _replay_chunk(chunk):
+    """
+    Worker entry point. Take list of move lists, return list of
+    ReplayResult tuples.
+    """
+    return [replay_game(moves) for moves in chunk]
+
+
+def _chunks(iterable, chunk_size):
+    """
+    Take iterable and chunk size, yield lists of up to chunk_size items
+    without reading ahead further than one chunk.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def replay_games(games, workers=None, chunk_size=64):
+    """
+    Take iterable of move lists (see replay_game()), number of worker
+    processes (default: all cores; 1 replays in this process) and games per
+    chunk. Yield one ReplayResult per game, in input order. The input is
+    consumed lazily, so archives larger than memory can be streamed.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for chunk in _chunks(games, chunk_size):
+            for result in _replay_chunk(chunk):
+                yield result
+        return
+
+    #Keep a bounded number of chunks in flight (Pool.imap would read the
+    #...whole input up front)
+    pending = collections.deque()
+    with multiprocessing.Pool(workers) as pool:
+        for chunk in _chunks(games, chunk_size):
+            pending.append(pool.apply_async(_replay_chunk, (chunk,)))
+            if len(pending) >= workers * 2:
+                for result in pending.popleft().get():
+                    yield result
+        while pending:
+            for result in pending.popleft().get():
+                yield result
@@ -0,0 +1,312 @@
+# Description:  Alpha-beta search engine for JanggiGame. Negamax with
+#               iterative deepening, a transposition table, principal
+#               variation tracking and cancellation. Moves come from the
+#               piece classes through JanggiGame.generate_moves() and are made
+#               with push_move()/pop_move(), so the engine and make_move()
+#               agree on what is legal.
+
+import random
+import threading
+import time
+
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from evaluation import DEFAULT_EVALUATION
+
+#Material values by piece kind: General, Guard, Horse, Elephant, Chariot,
+#...Cannon, Soldier (from evaluation.json; used for move ordering)
+PIECE_VALUES = DEFAULT_EVALUATION.get_material()
+
+MATE = 100000
+MATE_BOUND = MATE - 1000 #scores beyond this are mates, adjusted by ply
+INFINITY = MATE + 1
+MAX_DEPTH = 64
+CHECK_EVERY = 512 #nodes between time/cancellation checks (about 20 ms)
+
+
+class SearchAborted(Exception):
+    """
+    Raised inside the search when it is cancelled or runs out of time.
+    """
+
+
+def evaluate(game):
+    """
+    Take game, return its material and piece-square score (see
+    evaluation.py) from the point of view of the side to move.
+    """
+    return game.evaluate()
+
+
+class Searcher:
+    """
+    Represent a search over one JanggiGame. Take the game and optionally a
+    TranspositionTable to share between searches, an external stop event
+    (e.g. a multiprocessing.Event; the searcher never clears it) and a seed
+    that shuffles the order of quiet moves, so helper searchers sharing a
+    table explore different parts of the tree. The game is searched in
+    place and restored before search() returns.
+    """
+
+    def __init__(self, game, table=None, stop_event=None, seed=None):
+        """
+        Initialize searcher with private data members _game, _table, _stop,
+        _rng, _nodes, _next_check and per-search bookkeeping.
+        """
+        self._game = game
+        self._table = table if table is not None else TranspositionTable(16)
+        self._own_stop = stop_event is None
+        self._stop = threading.Event() if stop_event is None else stop_event
+        self._rng = random.Random(seed) if seed is not None else None
+        self._nodes = 0
+        self._next_check = CHECK_EVERY #node count at which to call _check_limits()
+        self._deadline = None
+        self._pushed = 0 #moves pushed by the search and not yet popped
+        self._path = [] #hashes of positions on the current line
+        self._pv = []
+
+    def stop(self):
+        """
+        Ask a running search to stop. Safe to call from another thread; the
+        search returns the result of its last completed iteration.
+        """
+        self._stop.set()
+
+    def get_table(self):
+        """
+        Return the transposition table used by the searcher.
+        """
+        return self._table
+
+    def search(self, depth=None, time_limit=None, info=None):
+        """
+        Take maximum depth and/or time limit in seconds (depth 4 if neither
+        is given) and optional info callback, called with the result dict
+        after each completed iteration. Return dict with best 'move' and
+        'pv' as (origin, destination) index pairs, 'score' for the side to
+        move, completed 'depth', 'nodes', 'time' and 'nps'.
+        """
+        if depth is None:
+            depth = MAX_DEPTH if time_limit is not None else 4
+        if self._own_stop:
+            self._stop.clear()
+        self._nodes = 0
+        self._next_check = CHECK_EVERY
+        self._deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        start = time.perf_counter()
+        result = {'move': None, 'pv': [], 'score': 0, 'depth': 0,
+                  'nodes': 0, 'time': 0.0, 'nps': 0}
+        if self._game.get_game_state() != 'UNFINISHED':
+            return result
+
+        for iteration in range(1, depth + 1):
+            self._pv = [[] for _ in range(MAX_DEPTH + 2)]
+            self._path = []
+            try:
+                score = self._negamax(iteration, -INFINITY, INFINITY, 0)
+            except SearchAborted:
+                while self._pushed: #unwind the line being searched
+                    self._game.pop_move()
+                    self._pushed -= 1
+                break
+            elapsed = time.perf_counter() - start
+            result = {'move': self._pv[0][0] if self._pv[0] else None,
+                      'pv': list(self._pv[0]), 'score': score, 'depth': iteration,
+                      'nodes': self._nodes, 'time': elapsed,
+                      'nps': int(self._nodes / elapsed) if elapsed > 0 else 0}
+            if info is not None:
+                info(result)
+            if abs(score) > MATE_BOUND: #forced mate found, deeper search won't change it
+                break
+
+        elapsed = time.perf_counter() - start
+        result['nodes'] = self._nodes
+        result['time'] = elapsed
+        result['nps'] = int(self._nodes / elapsed) if elapsed > 0 else 0
+        return result
+
+    def _check_limits(self):
+        """
+        Raise SearchAborted if the search was stopped or is out of time, and
+        schedule the next check CHECK_EVERY nodes on.
+        """
+        self._next_check = self._nodes + CHECK_EVERY
+        if self._stop.is_set():
+            raise SearchAborted()
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchAborted()
+
+    def _push(self, move):
+        """
+        Take move, make it on the game and return True if it does not leave
+        the moving side's general capturable. Illegal moves are taken back.
+        """
+        game = self._game
+        side = game.get_player_turn()
+        game.push_move(move[0], move[1])
+        if game.is_general_attacked(side):
+            game.pop_move()
+            return False
+        self._pushed += 1
+        return True
+
+    def _pop(self):
+        """
+        Take back the last move made by _push().
+        """
+        self._game.pop_move()
+        self._pushed -= 1
+
+    def _ordered_moves(self, tt_move, captures_only=False):
+        """
+        Take best move from the table (or None), return moves of the side to
+        move ordered table move first, then captures by victim value, then
+        quiet moves, then the pass. With captures_only, return just the
+        captures in JanggiGame.generate_captures() (MVV-LVA) order.
+        """
+        game = self._game
+        if captures_only:
+            return game.generate_captures(game.get_player_turn())
+        board = game.get_board()
+        captures = []
+        quiet = []
+        for move in game.generate_moves(game.get_player_turn()):
+            if move == tt_move:
+                continue
+            victim = board[move[1]]
+            if victim != 0:
+                captures.append((PIECE_VALUES[victim.get_kind()] * 10 -
+                                 PIECE_VALUES[board[move[0]].get_kind()], move))
+            else:
+                quiet.append(move)
+        captures.sort(reverse=True)
+        ordered = [move for _, move in captures]
+        if self._rng is not None:
+            self._rng.shuffle(quiet)
+        if tt_move is not None:
+            ordered.insert(0, tt_move)
+        ordered.extend(quiet)
+        general = game.get_general_square(game.get_player_turn())
+        if general is not None and tt_move != (general, general):
+            ordered.append((general, general)) #pass
+        return ordered
+
+    def _negamax(self, depth, alpha, beta, ply):
+        """
+        Take remaining depth, alpha-beta window and distance from the root,
+        return the score of the position for the side to move.
+        """
+        self._nodes += 1
+        if self._nodes >= self._next_check:
+            self._check_limits()
+        self._pv[ply] = []
+        game = self._game
+        key = game.position_hash()
+
+        if ply > 0 and key in self._path:
+            return 0 #repetition
+        if depth <= 0:
+            return self._quiescence(alpha, beta, ply)
+
+        original_alpha = alpha
+        entry = self._table.probe(key)
+        tt_move = None
+        if entry is not None:
+            tt_move, tt_score, tt_depth, bound = entry
+            if ply > 0 and tt_depth >= depth:
+                tt_score = _score_from_table(tt_score, ply)
+                if (bound == EXACT or (bound == LOWER and tt_score >= beta) or
+                        (bound == UPPER and tt_score <= alpha)):
+                    return tt_score
+            if tt_move is not None and not self._is_candidate(tt_move):
+                tt_move = None
+
+        best_score = -INFINITY
+        best_move = None
+        self._path.append(key)
+        for move in self._ordered_moves(tt_move):
+            if not self._push(move):
+                continue
+            score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            self._pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self._pv[ply] = [move] + self._pv[ply + 1]
+                    if alpha >= beta:
+                        break
+        self._path.pop()
+
+        if best_move is None: #no legal move, and passing is not allowed in check
+            return -MATE + ply
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self._table.store(key, best_move, _score_to_table(best_score, ply), depth, bound)
+        return best_score
+
+    def _quiescence(self, alpha, beta, ply):
+        """
+        Take alpha-beta window and distance from the root, return the score
+        of the position after resolving captures only.
+        """
+        self._pv[ply] = []
+        stand_pat = evaluate(self._game)
+        if stand_pat >= beta or ply >= MAX_DEPTH:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        for move in self._ordered_moves(None, captures_only=True):
+            self._nodes += 1
+            if self._nodes >= self._next_check: #quiescence can run long on its own
+                self._check_limits()
+            if not self._push(move):
+                continue
+            score = -self._quiescence(-beta, -alpha, ply + 1)
+            self._pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _is_candidate(self, move):
+        """
+        Take move from the table, return True if it is a pseudo-legal move in
+        the current position (guards against hash collisions).
+        """
+        origin, destination = move
+        game = self._game
+        piece = game.get_board()[origin]
+        if piece == 0 or piece.get_side() != game.get_player_turn():
+            return False
+        if origin == destination:
+            return game.get_general_square(game.get_player_turn()) == origin
+        return destination in piece.generate_moves(origin, game.get_board())
+
+
+def _score_to_table(score, ply):
+    """
+    Take score and ply, return mate scores made relative to the node.
+    """
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_table(score, ply):
+    """
+    Take stored score and ply, return mate scores made relative to the root.
+    """
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
@@ -0,0 +1,78 @@
+# Description:  Scaling benchmark for the multi-process search. Searches the
+#               stored test positions to a fixed depth with each worker
+#               count and reports nodes/sec and time-to-depth per count,
+#               with speedup relative to the first count.
+#
+#               Usage: python search_bench.py [--workers 1,2,4] [--depth N]
+#                                             [--position NAME]
+
+import argparse
+import sys
+
+from perft import POSITIONS, load_position
+
+
+def time_to_depth(name, depth, workers):
+    """
+    Take test position name, depth and worker count, search a fresh game of
+    that position and return (list of (depth, seconds) for each completed
+    iteration, final search result).
+    """
+    game = load_position(name)
+    times = []
+    result = game.search(depth=depth, workers=workers,
+                         info=lambda report: times.append((report['depth'], report['time'])))
+    return times, result
+
+
+def run(names, depth, worker_counts, out=None):
+    """
+    Take test position names, depth and worker counts, print the scaling
+    table to out (default: stdout) and return list of rows
+    (workers, total time, total nodes, nodes/sec, per-depth times).
+    """
+    out = out or sys.stdout
+    rows = []
+    for workers in worker_counts:
+        total_time = 0.0
+        total_nodes = 0
+        depth_times = [0.0] * depth
+        for name in names:
+            times, result = time_to_depth(name, depth, workers)
+            total_time += result['time']
+            total_nodes += result['nodes']
+            for completed, seconds in times:
+                depth_times[completed - 1] += seconds
+        nps = int(total_nodes / total_time) if total_time > 0 else 0
+        rows.append((workers, total_time, total_nodes, nps, depth_times))
+
+    base_time = rows[0][1]
+    out.write("workers  %s  %10s %10s %8s\n" % (
+        ' '.join('%7s' % ('d%d' % (d + 1)) for d in range(depth)), 'nodes', 'nodes/sec', 'speedup'))
+    for workers, total_time, total_nodes, nps, depth_times in rows:
+        speedup = base_time / total_time if total_time > 0 else 0.0
+        out.write("%7d  %s  %10d %10d %7.2fx\n" % (
+            workers, ' '.join('%6.2fs' % seconds for seconds in depth_times),
+            total_nodes, nps, speedup))
+    return rows
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Multi-process search scaling benchmark.")
+    parser.add_argument('--workers', default='1,2,4',
+                        help="comma-separated worker counts (default 1,2,4)")
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--position', choices=sorted(POSITIONS), action='append',
+                        help="test position (repeatable, default all)")
+    args = parser.parse_args(argv)
+
+    worker_counts = [int(count) for count in args.workers.split(',')]
+    run(args.position or list(POSITIONS), args.depth, worker_counts)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
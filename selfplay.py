@@ -0,0 +1,313 @@
+# Description:  Self-play data generation. Games are played on a process pool
+#               with a configurable move policy (uniform random legal move, or
+#               softmax over shallow search or one-ply scores) and every
+#               position is written to fixed-size binary shards together with
+#               the move played and the final result, for training
+#               evaluation models.
+#
+#               Each game gets its own random seed derived from the base
+#               seed and the game number, so the output is the same for any
+#               number of workers.
+#
+#               Shard file: HEADER (magic, version, record size, record
+#               count) then RECORD entries: packed position (see
+#               notation.pack), move as origin * 90 + destination (a pass
+#               has origin == destination) and result (index into RESULTS).
+#
+#               Usage: python selfplay.py OUTPUT_DIR [--games N] [--workers N]
+#                          [--policy random|search|softmax] [--seed N]
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+
+from JanggiGame import JanggiGame
+from move_tables import SQUARE_INDEX, SQUARE_NAMES
+from notation import PACKED_SIZE
+from search import Searcher, evaluate
+from transposition import TranspositionTable
+
+POLICIES = ('random', 'search', 'softmax')
+RESULTS = ('UNFINISHED', 'RED_WON', 'BLUE_WON')
+MAGIC = b'JGSP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')                 #magic, version, record size, record count
+RECORD = struct.Struct('<%dsHB' % PACKED_SIZE)   #position, move, result
+SHARD_RECORDS = 65536 #records per shard file
+SEARCH_TABLE_MB = 1 #transposition table per search policy move
+
+
+def random_policy(game, rng, depth, temperature):
+    """
+    Take game, random.Random, search depth and temperature (unused), return
+    a uniformly chosen legal (origin, destination) in algebraic notation, or
+    None if there is no legal move.
+    """
+    moves = game.all_legal_moves()
+    if not moves:
+        return None
+    return rng.choice(moves)
+
+
+def search_policy(game, rng, depth, temperature):
+    """
+    Take game, random.Random, search depth and temperature in score units,
+    return a legal move sampled as in softmax_policy(), with each move
+    scored by a depth-ply search of the position after it. Return None if
+    there is no legal move. Each call uses a fresh transposition table so a
+    game's moves depend only on its seed.
+    """
+    moves = game.all_legal_moves()
+    if not moves:
+        return None
+    table = TranspositionTable(SEARCH_TABLE_MB)
+    scores = []
+    for origin, destination in moves:
+        game.push_move(SQUARE_INDEX[origin], SQUARE_INDEX[destination])
+        scores.append(-Searcher(game, table).search(depth)['score'])
+        game.pop_move()
+    return _sample(moves, scores, rng, temperature)
+
+
+def softmax_policy(game, rng, depth, temperature):
+    """
+    Take game, random.Random, search depth (unused) and temperature in
+    score units, return a legal move sampled with probability proportional
+    to exp(score / temperature), where score is the evaluation (see
+    evaluation.py) after the move for the side making it. Return None if
+    there is no legal move.
+    """
+    moves = game.all_legal_moves()
+    if not moves:
+        return None
+    scores = []
+    for origin, destination in moves:
+        game.push_move(SQUARE_INDEX[origin], SQUARE_INDEX[destination])
+        scores.append(-evaluate(game))
+        game.pop_move()
+    return _sample(moves, scores, rng, temperature)
+
+
+def _sample(moves, scores, rng, temperature):
+    """
+    Take moves, their scores, random.Random and temperature, return a move
+    drawn with probability proportional to exp(score / temperature).
+    """
+    best = max(scores)
+    weights = [math.exp((score - best) / temperature) for score in scores]
+    return rng.choices(moves, weights)[0]
+
+
+_POLICY_FUNCTIONS = {'random': random_policy, 'search': search_policy, 'softmax': softmax_policy}
+
+
+def play_game(seed, policy='random', depth=1, temperature=100.0, max_plies=200):
+    """
+    Take game seed, policy name, search depth, softmax temperature and ply
+    limit. Play one game from the initial setup and return (list of
+    (packed position, move) pairs before each move, final game state). A
+    side with no legal move that is not in check passes.
+    """
+    choose = _POLICY_FUNCTIONS[policy]
+    rng = random.Random(seed)
+    game = JanggiGame()
+    positions = []
+    while game.get_game_state() == 'UNFINISHED' and len(positions) < max_plies:
+        side = game.get_player_turn()
+        move = choose(game, rng, depth, temperature)
+        if move is None:
+            if game.is_in_check(side):
+                break #no legal move in check: nothing left to play
+            general = SQUARE_NAMES[game.get_general_square(side)]
+            move = (general, general) #pass
+        packed = game.to_packed()
+        if not game.make_move(move[0], move[1]):
+            raise ValueError("policy %s chose illegal move %s-%s" % (policy, move[0], move[1]))
+        positions.append((packed, SQUARE_INDEX[move[0]] * 90 + SQUARE_INDEX[move[1]]))
+    return positions, game.get_game_state()
+
+
+def _play_records(task):
+    """
+    Worker entry point. Take (seed, policy, depth, temperature, max_plies),
+    play the game and return its records as bytes.
+    """
+    positions, state = play_game(*task)
+    result = RESULTS.index(state)
+    return b''.join(RECORD.pack(packed, move, result) for packed, move in positions)
+
+
+class ShardWriter:
+    """
+    Represent a writer of numbered shard files in a directory. Take the
+    directory and the number of records per shard.
+    """
+
+    def __init__(self, directory, shard_records=SHARD_RECORDS):
+        """
+        Initialize with private data members _directory, _shard_records,
+        _handle, _count (records in the open shard), _shards (paths written)
+        and _records (total).
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._shard_records = shard_records
+        self._handle = None
+        self._count = 0
+        self._shards = []
+        self._records = 0
+
+    def get_shards(self):
+        """
+        Return list of shard paths written so far.
+        """
+        return list(self._shards)
+
+    def get_record_count(self):
+        """
+        Return the total number of records written.
+        """
+        return self._records
+
+    def write(self, records):
+        """
+        Take bytes holding whole records, append them, starting new shards
+        as needed.
+        """
+        for offset in range(0, len(records), RECORD.size):
+            if self._handle is None:
+                path = os.path.join(self._directory, 'shard-%05d.bin' % len(self._shards))
+                self._handle = open(path, 'wb')
+                self._handle.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0))
+                self._shards.append(path)
+            self._handle.write(records[offset:offset + RECORD.size])
+            self._count += 1
+            self._records += 1
+            if self._count == self._shard_records:
+                self._finish_shard()
+
+    def _finish_shard(self):
+        """
+        Write the record count into the open shard's header and close it.
+        """
+        self._handle.seek(0)
+        self._handle.write(HEADER.pack(MAGIC, VERSION, RECORD.size, self._count))
+        self._handle.close()
+        self._handle = None
+        self._count = 0
+
+    def close(self):
+        """
+        Finish the last shard.
+        """
+        if self._handle is not None:
+            self._finish_shard()
+
+
+def read_shard(path):
+    """
+    Take shard path, yield (packed position, origin, destination, result)
+    per record, with board indices and result as a RESULTS name. Raise
+    ValueError if the file is not a shard.
+    """
+    with open(path, 'rb') as handle:
+        header = handle.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError("%s: not a self-play shard" % path)
+        magic, version, record_size, count = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError("%s: not a self-play shard" % path)
+        for _ in range(count):
+            packed, move, result = RECORD.unpack(handle.read(RECORD.size))
+            origin, destination = divmod(move, 90)
+            yield packed, origin, destination, RESULTS[result]
+
+
+def generate(directory, games, workers=None, policy='random', seed=0, depth=1,
+             temperature=100.0, max_plies=200, shard_records=SHARD_RECORDS):
+    """
+    Take output directory, number of games, worker processes (default: all
+    cores; 1 plays in this process), policy name, base seed, search depth,
+    softmax temperature, ply limit and records per shard. Play the games and
+    write their positions to shards; return dict with 'games', 'positions',
+    'shards', 'time', 'games_per_sec' and 'positions_per_sec'. Raise
+    ValueError for an unknown policy or a temperature that is not above 0.
+    """
+    if policy not in POLICIES:
+        raise ValueError("policy must be one of " + ", ".join(POLICIES))
+    if not temperature > 0:
+        raise ValueError("temperature must be above 0")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    tasks = ((seed * 1000003 + index, policy, depth, temperature, max_plies)
+             for index in range(games))
+    writer = ShardWriter(directory, shard_records)
+    start = time.perf_counter()
+    try:
+        if workers <= 1:
+            for records in map(_play_records, tasks):
+                writer.write(records)
+        else:
+            with multiprocessing.Pool(workers) as pool:
+                for records in pool.imap(_play_records, tasks, chunksize=4):
+                    writer.write(records)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    positions = writer.get_record_count()
+    return {
+        'games': games,
+        'positions': positions,
+        'shards': writer.get_shards(),
+        'time': elapsed,
+        'games_per_sec': games / elapsed if elapsed > 0 else 0.0,
+        'positions_per_sec': positions / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def _temperature(text):
+    """
+    Take command-line temperature text, return it as a float above 0.
+    Raise argparse.ArgumentTypeError otherwise.
+    """
+    try:
+        value = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("not a number: %r" % text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError("must be above 0: %r" % text)
+    return value
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Generate JanggiGame self-play shards.")
+    parser.add_argument('output', help="directory for the shard files")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--policy', choices=POLICIES, default='random')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--depth', type=int, default=1, help="search policy depth")
+    parser.add_argument('--temperature', type=_temperature, default=100.0,
+                        help="softmax and search policy temperature in score units")
+    parser.add_argument('--max-plies', type=int, default=200)
+    parser.add_argument('--shard-records', type=int, default=SHARD_RECORDS)
+    args = parser.parse_args(argv)
+
+    report = generate(args.output, args.games, args.workers, args.policy, args.seed,
+                      args.depth, args.temperature, args.max_plies, args.shard_records)
+    print("%d games, %d positions in %d shards, %.2fs: %.1f games/sec, %.0f positions/sec" % (
+        report['games'], report['positions'], len(report['shards']), report['time'],
+        report['games_per_sec'], report['positions_per_sec']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
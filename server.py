@@ -0,0 +1,320 @@
+# Description:  Asyncio game server hosting many JanggiGame sessions in one
+#               event loop. Clients speak JSON lines over TCP: each request
+#               is one JSON object with a 'cmd' and optional 'id', and gets
+#               one JSON response line with the same 'id'. Engine searches
+#               and batch validation run on a process pool so they never
+#               block the loop.
+#
+#               Commands:
+#                 new       [fen]                     -> game
+#                 move      game, origin, destination -> legal, state, turn
+#                 state     game                      -> state, turn, in_check, fen
+#                 board     game                      -> fen, codes (90 piece codes)
+#                 close     game
+#                 search    game, [depth], [time_limit] -> search result
+#                           (see _search_limits() for the allowed values)
+#                 validate  games (list of move lists)  -> replay results
+#                 stats                               -> latency percentiles
+#
+#               Each connection has at most max_pending requests in flight;
+#               beyond that the server stops reading from it, so a fast
+#               client is slowed down by TCP flow control rather than
+#               queueing work without bound. Games a connection created
+#               are closed when it disconnects.
+#
+#               Usage: python server.py [--host H] [--port P] [--workers N]
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import json
+import sys
+import time
+
+from JanggiGame import JanggiGame
+from replay import replay_game
+from stats import percentiles
+
+MAX_LINE = 1024 * 1024 #longest request line in bytes
+LATENCY_SAMPLES = 10000 #most recent samples kept per command
+COMMANDS = ('new', 'move', 'state', 'board', 'close', 'search', 'validate', 'stats')
+MAX_SEARCH_DEPTH = 12       #deepest search a client may ask for
+DEFAULT_SEARCH_TIME = 1.0   #seconds, when a search request gives no time_limit
+MAX_SEARCH_TIME = 10.0      #longest time_limit a client may ask for, in seconds
+
+
+def _search_limits(request):
+    """
+    Take search request dict, return its (depth, time_limit): depth None or
+    an integer from 1 to MAX_SEARCH_DEPTH, time_limit a number of seconds
+    above 0 and at most MAX_SEARCH_TIME, DEFAULT_SEARCH_TIME if not given.
+    Every search is bounded in time, so a pool worker is never held longer
+    than MAX_SEARCH_TIME. Raise ValueError for anything else.
+    """
+    depth = request.get('depth')
+    time_limit = request.get('time_limit', DEFAULT_SEARCH_TIME)
+    if depth is not None and (type(depth) != int or not 1 <= depth <= MAX_SEARCH_DEPTH):
+        raise ValueError("depth must be an integer from 1 to %d" % MAX_SEARCH_DEPTH)
+    if type(time_limit) not in (int, float) or not 0 < time_limit <= MAX_SEARCH_TIME:
+        raise ValueError("time_limit must be a number of seconds above 0 and at most %g"
+                         % MAX_SEARCH_TIME)
+    return depth, time_limit
+
+
+def _search_packed(packed, depth, time_limit):
+    """
+    Worker entry point. Take packed position, depth and time limit, return
+    the search result of a game set up in that position.
+    """
+    return JanggiGame.from_packed(packed).search(depth, time_limit)
+
+
+def _validate_games(games):
+    """
+    Worker entry point. Take list of move lists, return list of replay
+    results as dicts.
+    """
+    return [replay_game(moves)._asdict() for moves in games]
+
+
+class GameServer:
+    """
+    Represent a server hosting JanggiGame sessions. Take number of pool
+    worker processes for engine work (default: all cores) and the limit on
+    requests in flight per connection.
+    """
+
+    def __init__(self, workers=None, max_pending=32):
+        """
+        Initialize with private data members _games, _ids, _pool,
+        _max_pending, _latencies, _server and _connections.
+        """
+        self._games = {}
+        self._ids = itertools.count(1)
+        self._pool = concurrent.futures.ProcessPoolExecutor(workers)
+        self._max_pending = max_pending
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=LATENCY_SAMPLES))
+        self._server = None
+        self._connections = set() #(writer, handler task) per open connection
+
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        Take host and port (0 picks a free port), start listening and return
+        the (host, port) actually bound.
+        """
+        self._server = await asyncio.start_server(self._handle_connection, host, port,
+                                                  limit=MAX_LINE)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """
+        Serve connections until cancelled.
+        """
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stop listening, close open connections and shut the worker pool
+        down.
+        """
+        if self._server is not None:
+            self._server.close()
+        for writer, handler in list(self._connections):
+            writer.close()
+            await asyncio.gather(handler, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        await asyncio.to_thread(self._pool.shutdown, cancel_futures=True) #blocks until workers exit
+
+    def get_game_count(self):
+        """
+        Return the number of open games.
+        """
+        return len(self._games)
+
+    def get_stats(self):
+        """
+        Return dict with the number of open games and, per command, request
+        count and latency percentiles in milliseconds.
+        """
+        commands = {}
+        for command, samples in self._latencies.items():
+            commands[command] = {'count': len(samples)}
+            for name, value in percentiles(samples).items():
+                commands[command][name] = None if value is None else round(value * 1000, 3)
+        return {'games': len(self._games), 'commands': commands}
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Take stream reader and writer of a new connection, serve its
+        requests until it closes, then drop the games it created.
+        """
+        pending = asyncio.Semaphore(self._max_pending)
+        write_lock = asyncio.Lock()
+        owned = set() #ids of the games this connection created
+        tasks = set()
+        connection = (writer, asyncio.current_task())
+        self._connections.add(connection)
+        try:
+            while True:
+                await pending.acquire() #stop reading while the client has too much in flight
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError): #line over MAX_LINE or connection reset
+                    pending.release()
+                    break
+                if not line:
+                    pending.release()
+                    break
+                task = asyncio.ensure_future(self._serve_line(line, time.perf_counter(), writer,
+                                                              write_lock, pending, owned))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self._connections.discard(connection)
+            for game_id in owned:
+                self._games.pop(game_id, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _serve_line(self, line, started, writer, write_lock, pending, owned):
+        """
+        Take request line, time it was read, the connection's writer, write
+        lock, pending-request semaphore and set of its game ids. Run the
+        request, write the response and record its latency. Any error
+        becomes an error response, and the pending slot is always released.
+        """
+        command = None
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+                request_id = request.get('id')
+                command = request.get('cmd')
+                response = await self._dispatch(command, request, owned)
+                response['ok'] = True
+            except KeyError as error:
+                response = {'ok': False, 'error': "missing field %s" % error}
+            except (ValueError, TypeError) as error:
+                response = {'ok': False, 'error': str(error)}
+            except Exception as error: #e.g. a broken worker pool; keep serving
+                response = {'ok': False, 'error': "%s: %s" % (type(error).__name__, error)}
+            response['id'] = request_id
+            data = (json.dumps(response) + '\n').encode()
+            try:
+                async with write_lock:
+                    writer.write(data)
+                    await writer.drain() #waits while the client is not reading
+            except ConnectionError:
+                pass
+        finally:
+            pending.release()
+        self._latencies[command if command in COMMANDS else 'invalid'].append(
+            time.perf_counter() - started)
+
+    def _game(self, request):
+        """
+        Take request, return the game it names. Raise ValueError if there is
+        no such game.
+        """
+        game_id = request.get('game')
+        if game_id not in self._games:
+            raise ValueError("no game %r" % game_id)
+        return self._games[game_id]
+
+    async def _dispatch(self, command, request, owned):
+        """
+        Take command name, request dict and the connection's set of game ids,
+        run the command and return the response dict. Raise ValueError for
+        an unknown command or bad arguments.
+        """
+        if command == 'new':
+            fen = request.get('fen')
+            if fen is not None and not isinstance(fen, str):
+                raise ValueError("fen must be a string")
+            game = JanggiGame() if fen is None else JanggiGame.from_fen(fen)
+            game_id = next(self._ids)
+            self._games[game_id] = game
+            owned.add(game_id)
+            return {'game': game_id}
+        if command == 'move':
+            game = self._game(request)
+            legal = game.make_move(str(request['origin']), str(request['destination']))
+            return {'legal': legal, 'state': game.get_game_state(),
+                    'turn': game.get_player_turn()}
+        if command == 'state':
+            game = self._game(request)
+            in_check = [side for side in ('RED', 'BLUE') if game.is_in_check(side)]
+            return {'state': game.get_game_state(), 'turn': game.get_player_turn(),
+                    'in_check': in_check[0] if in_check else None, 'fen': game.to_fen()}
+        if command == 'board':
+            game = self._game(request)
+            return {'fen': game.to_fen(), 'codes': list(game.get_piece_codes())}
+        if command == 'close':
+            self._game(request)
+            del self._games[request['game']]
+            owned.discard(request['game'])
+            return {}
+        if command == 'search':
+            packed = self._game(request).to_packed() #snapshot; the game may move on meanwhile
+            depth, time_limit = _search_limits(request)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._pool, _search_packed, packed,
+                                                depth, time_limit)
+            return {'result': result}
+        if command == 'validate':
+            games = request['games']
+            if not isinstance(games, list):
+                raise ValueError("games must be a list of move lists")
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self._pool, _validate_games, games)
+            return {'results': results}
+        if command == 'stats':
+            return self.get_stats()
+        raise ValueError("unknown command %r" % command)
+
+
+async def serve(host, port, workers=None, max_pending=32):
+    """
+    Take host, port, worker count and per-connection request limit, run a
+    GameServer until cancelled.
+    """
+    server = GameServer(workers, max_pending)
+    bound = await server.start(host, port)
+    print("serving on %s:%d" % bound, flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description="JanggiGame JSON-lines game server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help="engine pool processes")
+    parser.add_argument('--max-pending', type=int, default=32,
+                        help="requests in flight per connection")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,21 @@
+# Description:  Latency statistics shared by the server and the benchmarks:
+#               nearest-rank percentiles over a list of samples.
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentiles(samples, points=PERCENTILES):
+    """
+    Take sequence of samples and percentile points, return dict mapping
+    'p<point>' to the nearest-rank percentile (None if there are no
+    samples).
+    """
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        if not ordered:
+            result['p%d' % point] = None
+            continue
+        rank = max(1, -(-point * len(ordered) // 100)) #ceil(point% of n)
+        result['p%d' % point] = ordered[rank - 1]
+    return result
@@ -0,0 +1,495 @@
+# Description:  Endgame tablebases for reduced material, built by retrograde
+#               analysis. A material signature such as 'krKA' (FEN letters,
+#               RED lowercase, BLUE uppercase: general and chariot against
+#               general and guard) is solved over every placement of its
+#               pieces: generals and guards only on their palace squares,
+#               soldiers only on rows they can reach.
+#
+#               Generation has two passes. The expensive one runs on a
+#               process pool: each worker generates the legal moves of its
+#               slice of positions with JanggiGame and reports their
+#               successors; captures are looked up in the smaller tables,
+#               which are generated first. The parent then inverts the move
+#               graph and works backwards from the checkmates, level by
+#               level, giving exact distance to mate.
+#
+#               A table is one file, <material>.jtb, holding HEADER and then
+#               one little-endian int16 per position: 0 draw, n > 0 win in n
+#               plies, n < 0 loss in -n - 1 plies, INVALID for impossible
+#               placements. Tablebase memory-maps the files for probing.
+#
+#               Usage: python tablebase.py MATERIAL [--directory DIR]
+#                                                   [--workers N]
+
+import argparse
+import array
+import collections
+import itertools
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+
+from JanggiGame import JanggiGame
+from move_tables import PALACES
+from notation import FEN_LETTERS
+
+MAGIC = b'JGTB'
+VERSION = 1
+HEADER = struct.Struct('<4sH16sQ')  #magic, version, material, position count
+VALUE = struct.Struct('<h')
+INVALID = -32768
+DRAW = 0
+SUFFIX = '.jtb'
+
+TablebaseResult = collections.namedtuple('TablebaseResult', ['result', 'distance'])
+TablebaseResult.__doc__ = """
+Tablebase value of a position: result 'WIN', 'LOSS' or 'DRAW' for the side
+to move and distance to mate in plies (None for a draw).
+"""
+
+_worker = {} #per-process generation state, set by _init_worker()
+
+
+def canonical_material(text):
+    """
+    Take material signature in FEN letters (any order), return it with RED
+    pieces first, each side in FEN_LETTERS order. Raise ValueError unless
+    each side has exactly one general.
+    """
+    for letter in text:
+        if letter.lower() not in FEN_LETTERS:
+            raise ValueError("unknown piece letter %r" % letter)
+    if text.count('k') != 1 or text.count('K') != 1:
+        raise ValueError("material needs one general per side: %r" % text)
+    red = sorted((letter for letter in text if letter.islower()), key=FEN_LETTERS.index)
+    blue = sorted((letter for letter in text if letter.isupper()),
+                  key=lambda letter: FEN_LETTERS.index(letter.lower()))
+    return ''.join(red + blue)
+
+
+def material_of(codes):
+    """
+    Take 90 piece codes, return the canonical material signature.
+    """
+    letters = ''
+    for code in codes:
+        if code:
+            letters += FEN_LETTERS[code - 1] if code <= 7 else FEN_LETTERS[code - 8].upper()
+    return canonical_material(letters)
+
+
+def sub_materials(material):
+    """
+    Take canonical material, return sorted list of the materials left after
+    one capture.
+    """
+    results = set()
+    for i, letter in enumerate(material):
+        if letter not in 'kK':
+            results.add(material[:i] + material[i + 1:])
+    return sorted(results)
+
+
+def _domain(code):
+    """
+    Take piece code, return tuple of the squares that piece can stand on.
+    """
+    side = 'RED' if code <= 7 else 'BLUE'
+    kind = code - 1 if code <= 7 else code - 8
+    if kind <= 1: #general, guard
+        return tuple(sorted(PALACES[side]))
+    if kind == 6: #soldier, never behind its own fourth row
+        return tuple(range(27, 90)) if side == 'RED' else tuple(range(63))
+    return tuple(range(90))
+
+
+class _Layout:
+    """
+    Represent the index layout of one material: per piece (in canonical
+    order) its code and the squares it can stand on. A position's index is
+    the mixed-radix number of its pieces' domain slots, times two plus 1
+    when RED is to move.
+    """
+
+    def __init__(self, material):
+        """
+        Initialize piece codes, domains, square-to-slot lookups and size.
+        """
+        self.material = material
+        self.codes = tuple(1 + FEN_LETTERS.index(letter) if letter.islower()
+                           else 8 + FEN_LETTERS.index(letter.lower()) for letter in material)
+        self.domains = tuple(_domain(code) for code in self.codes)
+        self.slots = []
+        for domain in self.domains:
+            slots = [-1] * 90
+            for slot, square in enumerate(domain):
+                slots[square] = slot
+            self.slots.append(tuple(slots))
+        self.size = 2
+        for domain in self.domains:
+            self.size *= len(domain)
+
+    def index(self, squares, red_to_move):
+        """
+        Take per-piece squares and whether RED is to move, return the
+        position index, or None if a piece is outside its domain.
+        """
+        index = 0
+        for piece, square in enumerate(squares):
+            slot = self.slots[piece][square]
+            if slot == -1:
+                return None
+            index = index * len(self.domains[piece]) + slot
+        return index * 2 + red_to_move
+
+    def squares(self, index):
+        """
+        Take position index, return (per-piece squares, red_to_move).
+        """
+        red_to_move = index & 1
+        index >>= 1
+        squares = [0] * len(self.domains)
+        for piece in range(len(self.domains) - 1, -1, -1):
+            index, slot = divmod(index, len(self.domains[piece]))
+            squares[piece] = self.domains[piece][slot]
+        return squares, red_to_move
+
+    def assign(self, codes):
+        """
+        Take 90 piece codes of a position with this material, return its
+        per-piece squares in layout order.
+        """
+        by_code = {}
+        for square, code in enumerate(codes):
+            if code:
+                by_code.setdefault(code, []).append(square)
+        return [by_code[code].pop() for code in self.codes]
+
+
+def _encode(result, distance):
+    """
+    Take 'WIN'/'LOSS'/'DRAW' and distance in plies, return the stored value.
+    """
+    if result == 'WIN':
+        return distance
+    if result == 'LOSS':
+        return -distance - 1
+    return DRAW
+
+
+def decode(value):
+    """
+    Take stored value, return TablebaseResult, or None for INVALID.
+    """
+    if value == INVALID:
+        return None
+    if value > 0:
+        return TablebaseResult('WIN', value)
+    if value < 0:
+        return TablebaseResult('LOSS', -value - 1)
+    return TablebaseResult('DRAW', None)
+
+
+class Tablebase:
+    """
+    Represent the set of tablebase files in a directory. Files are opened
+    and memory-mapped read-only on first use. Picklable: a copy sent to a
+    worker process maps the files itself.
+    """
+
+    def __init__(self, directory):
+        """
+        Initialize with the table directory and no open tables.
+        """
+        self._directory = directory
+        self._tables = {} #material -> (_Layout, mmap), or None if missing
+
+    def __reduce__(self):
+        """
+        Pickle as the directory, so each process maps the files itself.
+        """
+        return (Tablebase, (self._directory,))
+
+    def get_directory(self):
+        """
+        Return the table directory.
+        """
+        return self._directory
+
+    def path(self, material):
+        """
+        Take material, return the path of its table file.
+        """
+        return os.path.join(self._directory, canonical_material(material) + SUFFIX)
+
+    def _table(self, material):
+        """
+        Take canonical material, return (layout, mapping) for its table, or
+        None if there is no file. Raise ValueError if the file is corrupt.
+        """
+        if material not in self._tables:
+            path = self.path(material)
+            if not os.path.exists(path):
+                return None
+            layout = _Layout(material)
+            with open(path, 'rb') as handle:
+                mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, stored, count = HEADER.unpack_from(mapping, 0)
+            if (magic != MAGIC or version != VERSION or count != layout.size or
+                    stored.rstrip(b'\0').decode('ascii') != material or
+                    len(mapping) != HEADER.size + count * VALUE.size):
+                mapping.close()
+                raise ValueError("%s: not a tablebase for %s" % (path, material))
+            self._tables[material] = (layout, mapping)
+        return self._tables[material]
+
+    def has_material(self, material):
+        """
+        Take material signature, return True if its table file exists.
+        """
+        return os.path.exists(self.path(material))
+
+    def value(self, material, index):
+        """
+        Take canonical material and position index, return the stored value.
+        """
+        mapping = self._table(material)[1]
+        return VALUE.unpack_from(mapping, HEADER.size + index * VALUE.size)[0]
+
+    def probe(self, codes, player_turn):
+        """
+        Take 90 piece codes and side to move, return TablebaseResult for the
+        position, or None if there is no table for its material or the
+        position is outside the table.
+        """
+        try:
+            material = material_of(codes)
+        except ValueError:
+            return None
+        table = self._table(material)
+        if table is None:
+            return None
+        layout = table[0]
+        index = layout.index(layout.assign(codes), player_turn == 'RED')
+        if index is None:
+            return None
+        return decode(self.value(material, index))
+
+    def close(self):
+        """
+        Unmap every open table.
+        """
+        for table in self._tables.values():
+            table[1].close()
+        self._tables = {}
+
+
+def _init_worker(directory, material):
+    """
+    Worker initializer. Take table directory and material being generated,
+    set up the per-process layouts and the Tablebase for captures.
+    """
+    _worker['layout'] = _Layout(material)
+    _worker['sub_layouts'] = {}
+    _worker['tablebase'] = Tablebase(directory)
+
+
+def _successors(index):
+    """
+    Take position index of the material being generated, return None if the
+    position is impossible, otherwise (internal successor indices, values of
+    successors after a capture from the smaller tables).
+    """
+    layout = _worker['layout']
+    squares, red_to_move = layout.squares(index)
+    if len(set(squares)) != len(squares):
+        return None
+    codes = bytearray(90)
+    for piece, square in enumerate(squares):
+        codes[square] = layout.codes[piece]
+    side = 'RED' if red_to_move else 'BLUE'
+    try:
+        game = JanggiGame.from_codes(codes, side)
+    except ValueError: #side that just moved left its general en prise
+        return None
+
+    internal = []
+    external = []
+    piece_at = {square: piece for piece, square in enumerate(squares)}
+    for origin, destination in game.generate_moves(side):
+        game.push_move(origin, destination)
+        legal = not game.is_general_attacked(side)
+        game.pop_move()
+        if not legal:
+            continue
+        after = list(squares)
+        after[piece_at[origin]] = destination
+        captured = piece_at.get(destination)
+        if captured is None:
+            internal.append(layout.index(after, 1 - red_to_move))
+            continue
+        del after[captured]
+        material = layout.material[:captured] + layout.material[captured + 1:]
+        sub_layout = _worker['sub_layouts'].get(material)
+        if sub_layout is None:
+            sub_layout = _worker['sub_layouts'][material] = _Layout(material)
+        external.append(_worker['tablebase'].value(material, sub_layout.index(after, 1 - red_to_move)))
+    if not game.is_general_attacked(side):
+        internal.append(index ^ 1) #pass
+    return tuple(internal), tuple(external)
+
+
+def _successor_chunk(bounds):
+    """
+    Worker entry point. Take (start, end) index range, return list of
+    _successors() results for it.
+    """
+    return [_successors(index) for index in range(*bounds)]
+
+
+def _solve(size, positions):
+    """
+    Take table size and iterable of _successors() results in index order,
+    return array of stored values. Works back from the checkmates: a
+    position is a win one ply after its first losing successor and a loss
+    one ply after its last winning successor once all successors are wins.
+    """
+    values = array.array('h', [DRAW]) * size
+    remaining = array.array('l', [0]) * size #successors not yet known to be wins
+    longest = array.array('h', [-1]) * size  #longest win among capture successors
+    predecessors = [None] * size
+    levels = collections.defaultdict(list)
+
+    for index, successors in enumerate(positions):
+        if successors is None:
+            values[index] = INVALID
+            continue
+        internal, external = successors
+        for successor in internal:
+            if predecessors[successor] is None:
+                predecessors[successor] = [index]
+            else:
+                predecessors[successor].append(index)
+        count = len(internal)
+        for value in external:
+            result = decode(value)
+            if result is None or result.result == 'DRAW':
+                count += 1
+            elif result.result == 'LOSS':
+                levels[result.distance + 1].append((index, 'WIN'))
+            else:
+                longest[index] = max(longest[index], result.distance)
+        remaining[index] = count
+        if count == 0:
+            levels[longest[index] + 1].append((index, 'LOSS'))
+
+    level = 0
+    while levels:
+        for index, result in levels.pop(level, ()):
+            if values[index] != DRAW:
+                continue
+            values[index] = _encode(result, level)
+            for predecessor in predecessors[index] or ():
+                if values[predecessor] != DRAW:
+                    continue
+                if result == 'LOSS':
+                    levels[level + 1].append((predecessor, 'WIN'))
+                else:
+                    remaining[predecessor] -= 1
+                    if remaining[predecessor] == 0:
+                        loss_level = max(level, longest[predecessor]) + 1
+                        levels[loss_level].append((predecessor, 'LOSS'))
+        level += 1
+    return values
+
+
+def _write_table(path, material, values):
+    """
+    Take output path, canonical material and array of values, write the
+    table file.
+    """
+    if sys.byteorder != 'little':
+        values = array.array('h', values)
+        values.byteswap()
+    with open(path + '.tmp', 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, VERSION, material.encode('ascii'), len(values)))
+        values.tofile(handle)
+    os.replace(path + '.tmp', path)
+
+
+def generate(material, directory, workers=None, chunk_size=4096):
+    """
+    Take material signature, table directory, number of worker processes
+    (default: all cores; 1 generates in this process) and positions per
+    task. Generate the tables for every smaller material that is missing,
+    then the table itself, and return its path.
+    """
+    material = canonical_material(material)
+    tablebase = Tablebase(directory)
+    path = tablebase.path(material)
+    if os.path.exists(path):
+        return path
+    for sub_material in sub_materials(material):
+        generate(sub_material, directory, workers, chunk_size)
+    os.makedirs(directory, exist_ok=True)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    layout = _Layout(material)
+    bounds = [(start, min(start + chunk_size, layout.size))
+              for start in range(0, layout.size, chunk_size)]
+    if workers <= 1:
+        _init_worker(directory, material)
+        values = _solve(layout.size, itertools.chain.from_iterable(map(_successor_chunk, bounds)))
+    else:
+        with multiprocessing.Pool(workers, _init_worker, (directory, material)) as pool:
+            chunks = pool.imap(_successor_chunk, bounds)
+            values = _solve(layout.size, itertools.chain.from_iterable(chunks))
+    _write_table(path, material, values)
+    return path
+
+
+def summarize(tablebase, material):
+    """
+    Take Tablebase and material, return dict of position counts by result
+    ('WIN', 'LOSS', 'DRAW', 'INVALID') and the longest 'distance' to mate.
+    """
+    material = canonical_material(material)
+    layout = tablebase._table(material)[0]
+    counts = {'WIN': 0, 'LOSS': 0, 'DRAW': 0, 'INVALID': 0, 'distance': 0}
+    for index in range(layout.size):
+        result = decode(tablebase.value(material, index))
+        if result is None:
+            counts['INVALID'] += 1
+            continue
+        counts[result.result] += 1
+        if result.distance is not None:
+            counts['distance'] = max(counts['distance'], result.distance)
+    return counts
+
+
+def main(argv=None):
+    """
+    Command-line entry point. Generate a table and print its result counts.
+    """
+    parser = argparse.ArgumentParser(description="Generate a JanggiGame endgame tablebase.")
+    parser.add_argument('material', help="FEN letters, RED lowercase, e.g. krKA")
+    parser.add_argument('--directory', default='tablebases')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    path = generate(args.material, args.directory, args.workers)
+    elapsed = time.perf_counter() - start
+    counts = summarize(Tablebase(args.directory), args.material)
+    print("%s: %d wins, %d losses, %d draws, %d invalid, longest mate %d plies (%.1fs)" % (
+        path, counts['WIN'], counts['LOSS'], counts['DRAW'], counts['INVALID'],
+        counts['distance'], elapsed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
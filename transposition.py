@@ -0,0 +1,227 @@
+# Description:  Fixed-size transposition table keyed by the Zobrist position
+#               hash (JanggiGame.position_hash()). Entries hold best move,
+#               score, depth and bound type in flat typed arrays laid over a
+#               single byte buffer rather than a dict of objects. Laid over
+#               shared memory with lockless=True, the table can be written by
+#               several processes at once without locks.
+
+EMPTY = 0 #bound types stored in the flag array
+EXACT = 1
+LOWER = 2 #score is a lower bound (search failed high)
+UPPER = 3 #score is an upper bound (search failed low)
+
+POLICIES = ('depth', 'always')
+SLOT_BYTES = 16 #key 8 + score 4 + move 2 + depth 1 + flag 1
+BUCKET_SLOTS = 2
+
+
+class TranspositionTable:
+    """
+    Represent a transposition table of two-slot buckets. Take memory budget
+    in MB (size_mb), replacement policy and optionally an existing writable
+    buffer to lay the table over (its size then sets the number of slots).
+    With lockless=True each key is stored XORed with its entry's data, so an
+    entry torn by a concurrent write from another process fails the key
+    check instead of returning mixed data.
+
+    Policy 'depth': slot 0 of a bucket keeps the deepest search, slot 1 is
+    always replaced. Policy 'always': a new entry always goes in slot 0 and
+    the previous slot 0 entry moves to slot 1.
+    """
+
+    def __init__(self, size_mb=16, policy='depth', buffer=None, lockless=False):
+        """
+        Initialize the table arrays, replacement policy and hit, miss and
+        collision counters.
+        """
+        if policy not in POLICIES:
+            raise ValueError("policy must be one of " + ", ".join(POLICIES))
+        if buffer is None:
+            buffer = bytearray(int(size_mb * 1024 * 1024))
+        slots = len(buffer) // SLOT_BYTES
+        slots -= slots % BUCKET_SLOTS
+        if slots == 0:
+            raise ValueError("table too small for a single bucket")
+
+        self._policy = policy
+        self._lockless = lockless
+        self._slots = slots
+        self._buckets = slots // BUCKET_SLOTS
+        self._buffer = buffer
+
+        #Lay each field out as its own contiguous section of the buffer
+        view = memoryview(buffer)
+        self._keys = view[0:slots * 8].cast('Q')
+        self._scores = view[slots * 8:slots * 12].cast('i')
+        self._moves = view[slots * 12:slots * 14].cast('H')
+        self._depths = view[slots * 14:slots * 15].cast('b')
+        self._flags = view[slots * 15:slots * 16].cast('B')
+
+        self._hits = 0
+        self._misses = 0
+        self._collisions = 0
+        self._stores = 0
+        self._overwrites = 0
+
+    def get_policy(self):
+        """
+        Return the replacement policy name.
+        """
+        return self._policy
+
+    def get_size(self):
+        """
+        Return the number of entry slots in the table.
+        """
+        return self._slots
+
+    def probe(self, key):
+        """
+        Take position hash, return (move, score, depth, bound) for it, or None
+        if the position is not in the table. move is an (origin, destination)
+        pair or None.
+        """
+        slot = (key % self._buckets) * BUCKET_SLOTS
+        occupied = False
+        for index in (slot, slot + 1):
+            flag = self._flags[index]
+            if flag != EMPTY:
+                #Read the data before checking the key, so a lockless check
+                #...covers exactly what is returned
+                score = self._scores[index]
+                move = self._moves[index]
+                depth = self._depths[index]
+                stored = self._keys[index]
+                if self._lockless:
+                    stored ^= _data_word(score, move, depth, flag)
+                if stored == key:
+                    self._hits += 1
+                    return (_unpack_move(move), score, depth, flag)
+                occupied = True
+        self._misses += 1
+        if occupied:
+            self._collisions += 1 #bucket holds other positions
+        return None
+
+    def store(self, key, move, score, depth, bound):
+        """
+        Take position hash, best move ((origin, destination) or None), score,
+        search depth and bound type (EXACT, LOWER or UPPER) and record them
+        according to the replacement policy.
+        """
+        slot = (key % self._buckets) * BUCKET_SLOTS
+        self._stores += 1
+
+        if self._flags[slot] != EMPTY and self._stored_key(slot) == key:
+            index = slot
+        elif self._flags[slot + 1] != EMPTY and self._stored_key(slot + 1) == key:
+            index = slot + 1
+        elif self._policy == 'depth' and self._flags[slot] != EMPTY and depth < self._depths[slot]:
+            #Deeper result stays in slot 0, the new one replaces slot 1
+            index = slot + 1
+            if self._flags[index] != EMPTY:
+                self._overwrites += 1
+        else:
+            #New entry takes slot 0, the old slot 0 entry is pushed to slot 1
+            self._copy_slot(slot, slot + 1)
+            index = slot
+
+        if move is None and self._flags[index] != EMPTY and self._stored_key(index) == key:
+            packed_move = self._moves[index] #keep the old best move
+        else:
+            packed_move = _pack_move(move)
+        depth = max(-128, min(127, depth))
+        self._scores[index] = score
+        self._moves[index] = packed_move
+        self._depths[index] = depth
+        self._flags[index] = bound
+        if self._lockless:
+            key ^= _data_word(score, packed_move, depth, bound)
+        self._keys[index] = key
+
+    def _stored_key(self, index):
+        """
+        Take slot index, return the position hash stored in it.
+        """
+        if self._lockless:
+            return self._keys[index] ^ _data_word(self._scores[index], self._moves[index],
+                                                  self._depths[index], self._flags[index])
+        return self._keys[index]
+
+    def _copy_slot(self, source, target):
+        """
+        Take two slot indices, copy the entry at source over target.
+        """
+        if self._flags[source] == EMPTY:
+            return
+        if self._flags[target] != EMPTY and self._stored_key(target) != self._stored_key(source):
+            self._overwrites += 1
+        self._keys[target] = self._keys[source]
+        self._scores[target] = self._scores[source]
+        self._moves[target] = self._moves[source]
+        self._depths[target] = self._depths[source]
+        self._flags[target] = self._flags[source]
+
+    def clear(self):
+        """
+        Empty the table and reset the counters.
+        """
+        self._flags[:] = bytes(self._slots)
+        self._hits = self._misses = self._collisions = 0
+        self._stores = self._overwrites = 0
+
+    def close(self):
+        """
+        Release the table's views of its buffer, so a shared memory block
+        can be closed. The table cannot be used afterwards.
+        """
+        for view in (self._keys, self._scores, self._moves, self._depths, self._flags):
+            view.release()
+        self._buffer = None
+
+    def get_stats(self):
+        """
+        Return dict of table size, fill and hit, miss and collision counters.
+        """
+        probes = self._hits + self._misses
+        sample = min(self._slots, 1000)
+        used = sum(1 for index in range(sample) if self._flags[index] != EMPTY)
+        return {
+            'policy': self._policy,
+            'slots': self._slots,
+            'size_mb': len(self._buffer) / (1024 * 1024),
+            'hits': self._hits,
+            'misses': self._misses,
+            'collisions': self._collisions,
+            'stores': self._stores,
+            'overwrites': self._overwrites,
+            'hit_rate': self._hits / probes if probes else 0.0,
+            'fill': used / sample,
+        }
+
+
+def _data_word(score, packed_move, depth, flag):
+    """
+    Take an entry's score, packed move, depth and flag, return them packed
+    into one 64-bit word for lockless key checks.
+    """
+    return ((score & 0xFFFFFFFF) | (packed_move << 32) | ((depth & 0xFF) << 48) |
+            (flag << 56))
+
+
+def _pack_move(move):
+    """
+    Take (origin, destination) pair or None, return it packed into 16 bits.
+    """
+    if move is None:
+        return 0
+    return move[0] * 90 + move[1] + 1
+
+
+def _unpack_move(packed):
+    """
+    Take 16-bit packed move, return (origin, destination) pair or None.
+    """
+    if packed == 0:
+        return None
+    return divmod(packed - 1, 90)
@@ -0,0 +1,28 @@
+# Description:  Zobrist keys for Janggi positions. A position's 64-bit key is
+#               the XOR of one key per (piece kind, side, square) on the board,
+#               plus SIDE_KEY when RED is to move. Keys come from a fixed seed
+#               so every process agrees on the hash of a position.
+
+import random
+
+_rng = random.Random(0x4A414E474749) #fixed seed - hashes are stored on disk
+
+#Indexed [(kind, side)][square]; kind is the Piece subclass _kind (0-6)
+PIECE_KEYS = {(kind, side): tuple(_rng.getrandbits(64) for _ in range(90))
+              for kind in range(7) for side in ('RED', 'BLUE')}
+SIDE_KEY = _rng.getrandbits(64) #XORed in when RED is to move
+
+
+def compute_hash(board, player_turn):
+    """
+    Take board (list of 90 squares) and side to move, return the Zobrist key
+    of the position computed from scratch.
+    """
+    key = 0
+    for square in range(90):
+        value = board[square]
+        if value != 0:
+            key ^= PIECE_KEYS[value.get_kind(), value.get_side()][square]
+    if player_turn == 'RED':
+        key ^= SIDE_KEY
+    return key